@@ -1,94 +1,116 @@
 """Configuration management with YAML and environment variable support."""
 
 import os
+from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
 from pathlib import Path
-from typing import List, Optional
+from typing import FrozenSet, List, Optional
 import yaml
-from pydantic import BaseModel, Field
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+# Prefer the libyaml-backed loader; the PyPI wheels bundle it, but source
+# builds without libyaml-dev fall back to the pure-Python SafeLoader.
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+
+@lru_cache(maxsize=8)
+def _load_yaml_cached(path: str, mtime_ns: int, size: int) -> dict:
+    """Parse a YAML file, memoized on (path, mtime, size).
+
+    The stat fields are part of the key so an edited file is re-parsed,
+    while re-creating Config for an unchanged file is a cache hit.
+    """
+    with open(path, "rb") as f:
+        return yaml.load(f, Loader=_YamlLoader) or {}
+
 
 class ServerConfig(BaseSettings):
     """Server configuration."""
-    host: str = Field(default="0.0.0.0")
-    port: int = Field(default=5050)
-    debug: bool = Field(default=False)
-    cors_origins: List[str] = Field(default=["http://localhost:5050", "http://localhost:5173"])
-    secret_key: str = Field(default="INSECURE-CHANGE-THIS")
+    host: str = "0.0.0.0"
+    port: int = 5050
+    debug: bool = False
+    cors_origins: List[str] = ["http://localhost:5050", "http://localhost:5173"]
+    secret_key: str = "INSECURE-CHANGE-THIS"
 
     model_config = SettingsConfigDict(env_prefix="SERVER_")
 
 
 class FoldersConfig(BaseSettings):
     """Folder paths configuration."""
-    quarantine: str = Field(default="../ebooks/quarantine")
-    unsorted: str = Field(default="../ebooks/unsorted")
-    library: str = Field(default="../ebooks/library")
+    quarantine: str = "../ebooks/quarantine"
+    unsorted: str = "../ebooks/unsorted"
+    library: str = "../ebooks/library"
 
     model_config = SettingsConfigDict(env_prefix="FOLDERS_")
 
 
 class UploadConfig(BaseSettings):
     """Upload configuration."""
-    max_file_size_mb: int = Field(default=25)
-    allowed_extensions: List[str] = Field(
-        default=["epub", "pdf", "cbz", "cbr", "mobi", "azw3"]
-    )
-    allowed_mime_types: List[str] = Field(
-        default=[
-            "application/epub+zip",
-            "application/pdf",
-            "application/x-cbr",
-            "application/x-cbz",
-            "application/zip",
-            "application/vnd.amazon.ebook",
-            "application/x-mobipocket-ebook",
-        ]
-    )
+    max_file_size_mb: int = 25
+    allowed_extensions: List[str] = ["epub", "pdf", "cbz", "cbr", "mobi", "azw3"]
+    allowed_mime_types: List[str] = [
+        "application/epub+zip",
+        "application/pdf",
+        "application/x-cbr",
+        "application/x-cbz",
+        "application/zip",
+        "application/vnd.amazon.ebook",
+        "application/x-mobipocket-ebook",
+    ]
 
     model_config = SettingsConfigDict(env_prefix="UPLOAD_")
 
+    @cached_property
+    def allowed_extensions_set(self) -> FrozenSet[str]:
+        """Lower-cased allowed extensions for O(1) membership checks."""
+        return frozenset(e.lower() for e in self.allowed_extensions)
+
 
 class SecurityConfig(BaseSettings):
     """Security configuration."""
-    enable_rate_limiting: bool = Field(default=True)
-    rate_limit_uploads_per_minute: int = Field(default=10)
-    enable_csrf_protection: bool = Field(default=True)
-    file_permissions_mode: int = Field(default=0o600)
-    directory_permissions_mode: int = Field(default=0o700)
-    sanitize_filenames: bool = Field(default=True)
+    enable_rate_limiting: bool = True
+    rate_limit_uploads_per_minute: int = 10
+    enable_csrf_protection: bool = True
+    file_permissions_mode: int = 0o600
+    directory_permissions_mode: int = 0o700
+    sanitize_filenames: bool = True
 
     model_config = SettingsConfigDict(env_prefix="SECURITY_")
 
 
 class ScanningConfig(BaseSettings):
     """Scanning configuration (Step 2)."""
-    enabled: bool = Field(default=False)
-    provider: str = Field(default="virustotal")
-    virustotal_api_key: str = Field(default="")
-    virustotal_timeout: int = Field(default=60)
-    polling_interval_sec: int = Field(default=30)
-    max_retries: int = Field(default=20)
-    auto_delete_infected: bool = Field(default=False)
-    auto_skip_known_hashes: bool = Field(default=True)
+    enabled: bool = False
+    provider: str = "virustotal"
+    virustotal_api_key: str = ""
+    virustotal_timeout: int = 60
+    polling_interval_sec: int = 30
+    max_retries: int = 20
+    auto_delete_infected: bool = False
+    auto_skip_known_hashes: bool = True
 
     model_config = SettingsConfigDict(env_prefix="SCANNING_")
 
 
-class PreviewSettings(BaseModel):
+@dataclass(slots=True)
+class PreviewSettings:
     """Preview settings nested in metadata config."""
-    max_pages: int = Field(default=3)
-    width: int = Field(default=1024)
-    height: int = Field(default=768)
+    max_pages: int = 3
+    width: int = 1024
+    height: int = 768
 
 
 class MetadataConfig(BaseSettings):
     """Metadata configuration (Step 3)."""
-    enabled: bool = Field(default=True)
-    extract_on_upload: bool = Field(default=False)
-    allow_user_editing: bool = Field(default=True)
-    required_fields: List[str] = Field(default=["title", "author"])
-    auto_save_on_no_changes: bool = Field(default=True)
+    enabled: bool = True
+    extract_on_upload: bool = False
+    allow_user_editing: bool = True
+    required_fields: List[str] = ["title", "author"]
+    auto_save_on_no_changes: bool = True
     preview_settings: PreviewSettings = Field(default_factory=PreviewSettings)
 
     model_config = SettingsConfigDict(env_prefix="METADATA_")
@@ -96,56 +118,58 @@ class MetadataConfig(BaseSettings):
 
 class DuplicateDetectionConfig(BaseSettings):
     """Duplicate detection configuration (Step 2)."""
-    enabled: bool = Field(default=True)
-    hash_algorithm: str = Field(default="sha256")
-    check_by_hash: bool = Field(default=True)
-    check_by_size: bool = Field(default=True)
-    check_by_name: bool = Field(default=False)
-    discard_exact_hash: bool = Field(default=True)
-    rename_duplicates: bool = Field(default=True)
-    rename_pattern: str = Field(default="{name}_{timestamp}{ext}")
+    enabled: bool = True
+    hash_algorithm: str = "sha256"
+    check_by_hash: bool = True
+    check_by_size: bool = True
+    check_by_name: bool = False
+    discard_exact_hash: bool = True
+    rename_duplicates: bool = True
+    rename_pattern: str = "{name}_{timestamp}{ext}"
+    library_index_refresh_minutes: int = 0  # Re-scan libraries for the hash index (0 = disabled)
 
     model_config = SettingsConfigDict(env_prefix="DUPLICATE_DETECTION_")
 
 
 class PreviewConfig(BaseSettings):
     """Preview configuration (Step 2 stub, Step 3 full)."""
-    enabled: bool = Field(default=True)
-    max_pages: int = Field(default=3)
-    width: int = Field(default=1024)
-    height: int = Field(default=768)
-    supported_types: List[str] = Field(default=["pdf", "epub"])
-    cache_previews: bool = Field(default=True)
-    preview_format: str = Field(default="base64")
-    auto_cleanup_hours: int = Field(default=24)
+    enabled: bool = True
+    max_pages: int = 3
+    width: int = 1024
+    height: int = 768
+    supported_types: List[str] = ["pdf", "epub"]
+    cache_previews: bool = True
+    preview_format: str = "base64"
+    auto_cleanup_hours: int = 24
 
     model_config = SettingsConfigDict(env_prefix="PREVIEW_")
 
 
-class NotificationSettings(BaseModel):
+@dataclass(slots=True)
+class NotificationSettings:
     """Notification settings nested in moving config."""
-    email_enabled: bool = Field(default=False)
-    email_recipients: List[str] = Field(default_factory=list)
-    webhook_enabled: bool = Field(default=False)
-    webhook_url: str = Field(default="")
+    email_enabled: bool = False
+    email_recipients: List[str] = field(default_factory=list)
+    webhook_enabled: bool = False
+    webhook_url: str = ""
 
 
 class MovingConfig(BaseSettings):
     """Moving configuration (Step 4)."""
-    enabled: bool = Field(default=True)
-    unsorted_dir: str = Field(default="../ebooks/unsorted")
+    enabled: bool = True
+    unsorted_dir: str = "../ebooks/unsorted"
     kavita_library_dirs: List[str] = Field(default_factory=lambda: ["../ebooks/library"])
-    rename_on_name_conflict: bool = Field(default=True)
-    rename_pattern: str = Field(default="{title} - {author} (duplicate_{timestamp}){ext}")
-    discard_on_exact_duplicate: bool = Field(default=True)
-    keep_duplicate_log: bool = Field(default=True)
-    verify_integrity_post_move: bool = Field(default=True)
-    dry_run: bool = Field(default=False)
-    checksum_manifest: bool = Field(default=True)
-    manifest_path: str = Field(default="logs/manifest.csv")
-    log_moves: bool = Field(default=True)
-    atomic_operations: bool = Field(default=True)
-    cleanup_quarantine_on_success: bool = Field(default=True)
+    rename_on_name_conflict: bool = True
+    rename_pattern: str = "{title} - {author} (duplicate_{timestamp}){ext}"
+    discard_on_exact_duplicate: bool = True
+    keep_duplicate_log: bool = True
+    verify_integrity_post_move: bool = True
+    dry_run: bool = False
+    checksum_manifest: bool = True
+    manifest_path: str = "logs/manifest.csv"
+    log_moves: bool = True
+    atomic_operations: bool = True
+    cleanup_quarantine_on_success: bool = True
     notification: NotificationSettings = Field(default_factory=NotificationSettings)
 
     model_config = SettingsConfigDict(env_prefix="MOVING_")
@@ -153,63 +177,63 @@ class MovingConfig(BaseSettings):
 
 class DiskProtectionConfig(BaseSettings):
     """Disk space protection configuration."""
-    enabled: bool = Field(default=True)
-    min_free_space_percent: float = Field(default=10.0)  # Minimum 10% free space
-    reserve_space_bytes: int = Field(default=1073741824)  # 1 GB reserve
-    max_quarantine_size_bytes: int = Field(default=10737418240)  # 10 GB max quarantine
-    max_single_upload_size_mb: int = Field(default=100)  # 100 MB per upload
-    auto_cleanup_enabled: bool = Field(default=True)
-    auto_cleanup_age_hours: int = Field(default=72)  # 3 days
-    cleanup_interval_minutes: int = Field(default=60)  # Run cleanup hourly
-    emergency_cleanup_threshold_percent: float = Field(default=5.0)  # Trigger emergency at 5% free
-    alert_threshold_percent: float = Field(default=15.0)  # Alert at 15% free
+    enabled: bool = True
+    min_free_space_percent: float = 10.0  # Minimum 10% free space
+    reserve_space_bytes: int = 1073741824  # 1 GB reserve
+    max_quarantine_size_bytes: int = 10737418240  # 10 GB max quarantine
+    max_single_upload_size_mb: int = 100  # 100 MB per upload
+    auto_cleanup_enabled: bool = True
+    auto_cleanup_age_hours: int = 72  # 3 days
+    cleanup_interval_minutes: int = 60  # Run cleanup hourly
+    emergency_cleanup_threshold_percent: float = 5.0  # Trigger emergency at 5% free
+    alert_threshold_percent: float = 15.0  # Alert at 15% free
 
     model_config = SettingsConfigDict(env_prefix="DISK_PROTECTION_")
 
 
 class LoggingConfig(BaseSettings):
     """Logging configuration."""
-    level: str = Field(default="INFO")
-    format: str = Field(default="json")
-    console_format: str = Field(default="text")
-    console_level: str = Field(default="INFO")
-    file: str = Field(default="logs/uploader.log")
-    max_bytes: int = Field(default=10485760)
-    backup_count: int = Field(default=5)
+    level: str = "INFO"
+    format: str = "json"
+    console_format: str = "text"
+    console_level: str = "INFO"
+    file: str = "logs/uploader.log"
+    max_bytes: int = 10485760
+    backup_count: int = 5
 
     model_config = SettingsConfigDict(env_prefix="LOGGING_")
 
 
 class ApiProtectionConfig(BaseSettings):
     """API protection configuration."""
-    enabled: bool = Field(default=True)
-    require_header: bool = Field(default=True)
-    header_name: str = Field(default="X-UI-Request")
-    header_value: str = Field(default="1")
-    disable_docs: bool = Field(default=True)
-    allow_docs_in_debug: bool = Field(default=True)
+    enabled: bool = True
+    require_header: bool = True
+    header_name: str = "X-UI-Request"
+    header_value: str = "1"
+    disable_docs: bool = True
+    allow_docs_in_debug: bool = True
 
     model_config = SettingsConfigDict(env_prefix="API_PROTECTION_")
 
 
 class KavitaConfig(BaseSettings):
     """Kavita server configuration for authentication."""
-    enabled: bool = Field(default=False)  # Enable to require Kavita login
-    server_url: str = Field(default="http://localhost:5000")  # Kavita server URL
-    api_key: str = Field(default="")  # Optional: Kavita API key (if using API key auth)
-    use_api_key: bool = Field(default=False)  # Use API key instead of username/password
-    verify_ssl: bool = Field(default=True)  # Verify SSL certificates
-    timeout: int = Field(default=10)  # Request timeout in seconds
+    enabled: bool = False  # Enable to require Kavita login
+    server_url: str = "http://localhost:5000"  # Kavita server URL
+    api_key: str = ""  # Optional: Kavita API key (if using API key auth)
+    use_api_key: bool = False  # Use API key instead of username/password
+    verify_ssl: bool = True  # Verify SSL certificates
+    timeout: int = 10  # Request timeout in seconds
 
     model_config = SettingsConfigDict(env_prefix="KAVITA_")
 
 
 class AuthConfig(BaseSettings):
     """Authentication configuration."""
-    require_auth: bool = Field(default=False)  # Require authentication for uploads
-    session_secret: str = Field(default="INSECURE-CHANGE-THIS")  # Secret for JWT tokens
-    token_expiry_hours: int = Field(default=24)  # Token expiry in hours
-    cookie_name: str = Field(default="kavita_uploader_token")  # Cookie name for token
+    require_auth: bool = False  # Require authentication for uploads
+    session_secret: str = "INSECURE-CHANGE-THIS"  # Secret for JWT tokens
+    token_expiry_hours: int = 24  # Token expiry in hours
+    cookie_name: str = "kavita_uploader_token"  # Cookie name for token
 
     model_config = SettingsConfigDict(env_prefix="AUTH_")
 
@@ -237,33 +261,84 @@ class Config:
             if not os.path.exists(self.config_path):
                 self.config_path = "config.yaml"
         
-        self._yaml_config = {}
-
-        # Load YAML configuration if file exists
-        if os.path.exists(self.config_path):
-            with open(self.config_path, "r") as f:
-                self._yaml_config = yaml.safe_load(f) or {}
-        else:
+        # The YAML file itself is read on first use (see _yaml_config)
+
+    @cached_property
+    def _yaml_config(self) -> dict:
+        """Parsed config.yaml, or an empty dict if the file does not exist."""
+        try:
+            st = os.stat(self.config_path)
+        except FileNotFoundError:
             print(f"WARNING: Config file not found at {self.config_path}, using defaults")
-
-        # Initialize all configuration sections
-        # Environment variables will automatically override YAML values
-        self.server = ServerConfig(**self._yaml_config.get("server", {}))
-        self.folders = FoldersConfig(**self._yaml_config.get("folders", {}))
-        self.upload = UploadConfig(**self._yaml_config.get("upload", {}))
-        self.security = SecurityConfig(**self._yaml_config.get("security", {}))
-        self.scanning = ScanningConfig(**self._yaml_config.get("scanning", {}))
-        self.metadata = MetadataConfig(**self._yaml_config.get("metadata", {}))
-        self.duplicate_detection = DuplicateDetectionConfig(
-            **self._yaml_config.get("duplicate_detection", {})
+            return {}
+        return _load_yaml_cached(
+            os.path.abspath(self.config_path), st.st_mtime_ns, st.st_size
         )
-        self.preview = PreviewConfig(**self._yaml_config.get("preview", {}))
-        self.moving = MovingConfig(**self._yaml_config.get("moving", {}))
-        self.disk_protection = DiskProtectionConfig(**self._yaml_config.get("disk_protection", {}))
-        self.logging = LoggingConfig(**self._yaml_config.get("logging", {}))
-        self.api_protection = ApiProtectionConfig(**self._yaml_config.get("api_protection", {}))
-        self.kavita = KavitaConfig(**self._yaml_config.get("kavita", {}))
-        self.auth = AuthConfig(**self._yaml_config.get("auth", {}))
+
+    # Configuration sections are built lazily on first access and cached on
+    # the instance. Environment variables override YAML values when a
+    # section is constructed.
+
+    @cached_property
+    def server(self) -> ServerConfig:
+        return ServerConfig(**self._yaml_config.get("server", {}))
+
+    @cached_property
+    def folders(self) -> FoldersConfig:
+        return FoldersConfig(**self._yaml_config.get("folders", {}))
+
+    @cached_property
+    def upload(self) -> UploadConfig:
+        return UploadConfig(**self._yaml_config.get("upload", {}))
+
+    @cached_property
+    def security(self) -> SecurityConfig:
+        return SecurityConfig(**self._yaml_config.get("security", {}))
+
+    @cached_property
+    def scanning(self) -> ScanningConfig:
+        return ScanningConfig(**self._yaml_config.get("scanning", {}))
+
+    @cached_property
+    def metadata(self) -> MetadataConfig:
+        return MetadataConfig(**self._yaml_config.get("metadata", {}))
+
+    @cached_property
+    def duplicate_detection(self) -> DuplicateDetectionConfig:
+        return DuplicateDetectionConfig(**self._yaml_config.get("duplicate_detection", {}))
+
+    @cached_property
+    def preview(self) -> PreviewConfig:
+        return PreviewConfig(**self._yaml_config.get("preview", {}))
+
+    @cached_property
+    def moving(self) -> MovingConfig:
+        return MovingConfig(**self._yaml_config.get("moving", {}))
+
+    @cached_property
+    def disk_protection(self) -> DiskProtectionConfig:
+        return DiskProtectionConfig(**self._yaml_config.get("disk_protection", {}))
+
+    @cached_property
+    def logging(self) -> LoggingConfig:
+        return LoggingConfig(**self._yaml_config.get("logging", {}))
+
+    @cached_property
+    def api_protection(self) -> ApiProtectionConfig:
+        return ApiProtectionConfig(**self._yaml_config.get("api_protection", {}))
+
+    @cached_property
+    def kavita(self) -> KavitaConfig:
+        return KavitaConfig(**self._yaml_config.get("kavita", {}))
+
+    @cached_property
+    def auth(self) -> AuthConfig:
+        return AuthConfig(**self._yaml_config.get("auth", {}))
+
+    @staticmethod
+    def invalidate_cache():
+        """Drop cached YAML parses so the next Config() re-reads from disk."""
+        _load_yaml_cached.cache_clear()
 
     def ensure_directories(self):
         """Create necessary directories with secure permissions."""
@@ -275,15 +350,17 @@ class Config:
 
         for directory in directories:
             path = Path(directory)
-            if not path.exists():
-                path.mkdir(parents=True, exist_ok=True)
-                # Set secure directory permissions
-                os.chmod(path, self.security.directory_permissions_mode)
-
-    @property
+            try:
+                path.mkdir(parents=True)
+            except FileExistsError:
+                continue
+            # Set secure directory permissions on newly created directories only
+            os.chmod(path, self.security.directory_permissions_mode)
+
+    @cached_property
     def max_file_size_bytes(self) -> int:
-        """Get max file size in bytes."""
-        return self.upload.max_file_size_mb * 1024 * 1024
+        """Get max file size in bytes (computed once per Config instance)."""
+        return self.upload.max_file_size_mb << 20
     
     @property
     def quarantine_dir(self) -> str:
@@ -1,17 +1,87 @@
 """Database models and session management."""
 
 from datetime import datetime
-from typing import Optional
+from functools import lru_cache
+from typing import Dict, Optional
 from pathlib import Path
+import json
 import os
-from sqlalchemy import Column, Integer, String, DateTime, BigInteger, Boolean, Text, inspect
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger, Float, Text, Index, bindparam, inspect, select, update
+from sqlalchemy.exc import NoSuchTableError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy import event, text
+from sqlalchemy.types import TypeDecorator
 
 Base = declarative_base()
 
+# Applied to every new SQLite connection. WAL lets readers proceed while an
+# upload is being written, and synchronous=NORMAL is durable in WAL mode
+# while avoiding an fsync on every commit.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-64000",
+)
 
+# Bump whenever tables, columns or indexes are added. init_db records it
+# in SQLite's user_version header so boots against an up-to-date database
+# skip reflection and migration entirely.
+SCHEMA_VERSION = 5
+
+# Columns added to the uploads table after its first release, with the DDL
+# used to add them to older databases (Step 3 & 4 additions + auth).
+_REQUIRED_COLUMNS = (
+    ("metadata_json", "TEXT"),
+    ("metadata_edited", "BOOLEAN DEFAULT 0"),
+    ("metadata_extracted_at", "DATETIME"),
+    ("metadata_verified_at", "DATETIME"),
+    ("preview_generated", "BOOLEAN DEFAULT 0"),
+    ("preview_path", "VARCHAR(500)"),
+    ("duplicate_reason", "VARCHAR(255)"),  # Step 4
+    ("uploaded_by", "VARCHAR(255)"),  # Authentication: username
+    ("title_lc", "TEXT"),  # Name conflict lookups
+    ("author_lc", "TEXT"),
+)
+
+# Indexes earlier schema versions created that the composite indexes now
+# cover through their leading column.
+_OBSOLETE_INDEXES = ("ix_uploads_status", "ix_uploads_file_hash_sha256")
+
+
+def _metadata_lookup_keys(metadata_json: Optional[str]) -> Dict[str, Optional[str]]:
+    """Normalized title/author columns for a metadata JSON string.
+
+    Values are stripped and lowercased in Python (SQLite's lower() only folds
+    ASCII); anything missing or not a string becomes None.
+    """
+    try:
+        metadata = json.loads(metadata_json) if metadata_json else None
+    except ValueError:
+        metadata = None
+    if not isinstance(metadata, dict):
+        metadata = {}
+    keys = {}
+    for field in ("title", "author"):
+        value = metadata.get(field)
+        keys[f"{field}_lc"] = value.strip().lower() if isinstance(value, str) else None
+    return keys
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Engine ``connect`` hook that applies SQLITE_PRAGMAS."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+@lru_cache(maxsize=1)
 def get_database_path() -> str:
     """Get database file path.
     
@@ -19,6 +89,9 @@ def get_database_path() -> str:
     1. Environment variable DATABASE_PATH
     2. Project root (safeuploader.db)
     3. Backend directory (uploader.db)
+    
+    The result is cached; call ``get_database_path.cache_clear()`` after
+    changing DATABASE_PATH.
     """
     # Check environment variable first
     if os.getenv("DATABASE_PATH"):
@@ -45,9 +118,54 @@ def get_database_path() -> str:
     return f"sqlite+aiosqlite:///{db_path}"
 
 
+def _reflect_upload_columns(sync_conn) -> Optional[set]:
+    """Return the column names of the uploads table, or None if it is missing."""
+    try:
+        columns = inspect(sync_conn).get_columns("uploads")
+    except NoSuchTableError:
+        return None
+    return {column["name"] for column in columns}
+
+
+def _create_missing_indexes(sync_conn):
+    """Drop superseded indexes and create any model index the table lacks."""
+    for name in _OBSOLETE_INDEXES:
+        sync_conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    for index in Upload.__table__.indexes:
+        index.create(sync_conn, checkfirst=True)
+
+
+class BoolInt(TypeDecorator):
+    """Boolean flag stored as a plain INTEGER 0/1.
+
+    SQLite has no native boolean, and ``bool`` is already an ``int`` for the
+    sqlite3 driver, so values are bound as-is instead of going through
+    ``Boolean``'s per-row conversion. Rows still read back as ``bool``.
+    """
+
+    impl = Integer
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        return None
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else bool(value)
+
+
 class Upload(Base):
     """Upload record model."""
     __tablename__ = "uploads"
+    __table_args__ = (
+        # Status listings / cleanup ordered by age
+        Index("ix_uploads_status_uploaded_at", "status", "uploaded_at"),
+        # Duplicate lookups by hash and size
+        Index("ix_uploads_hash_size", "file_hash_sha256", "file_size"),
+        # Covers the quarantine-size SUM, so it reads only quarantined entries
+        Index("ix_uploads_status_size", "status", "file_size"),
+        # Name conflict lookups by title and author
+        Index("ix_uploads_title_author_status", "title_lc", "author_lc", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     uuid = Column(String(36), unique=True, index=True, nullable=False)
@@ -59,8 +177,8 @@ class Upload(Base):
     
     # Status tracking
     status = Column(String(50), default="quarantined", nullable=False)  # quarantined, scanning, scanned, metadata_pending, safe, infected, moved, failed
-    quarantine_path = Column(String(500), nullable=False)
-    final_path = Column(String(500), nullable=True)
+    quarantine_path = Column(String, nullable=False)
+    final_path = Column(String, nullable=True)
     
     # Hashing for duplicate detection
     file_hash_sha256 = Column(String(64), nullable=True)
@@ -76,14 +194,16 @@ class Upload(Base):
     
     # Metadata (Step 3)
     metadata_json = Column(Text, nullable=True)  # JSON string with extracted/edited metadata
-    metadata_edited = Column(Boolean, default=False)
+    title_lc = Column(Text, nullable=True)  # Normalized from metadata_json on assignment
+    author_lc = Column(Text, nullable=True)
+    metadata_edited = Column(BoolInt, default=False)
     metadata_extracted_at = Column(DateTime, nullable=True)
     metadata_verified_at = Column(DateTime, nullable=True)
-    preview_generated = Column(Boolean, default=False)
-    preview_path = Column(String(500), nullable=True)
+    preview_generated = Column(BoolInt, default=False)
+    preview_path = Column(String, nullable=True)
     
     # Duplicate detection (Step 4)
-    is_duplicate = Column(Boolean, default=False)
+    is_duplicate = Column(BoolInt, default=False)
     duplicate_of = Column(String(36), nullable=True)  # UUID of original file
     duplicate_reason = Column(String(255), nullable=True)  # Reason for duplicate rejection (exact_hash, name_conflict, etc.)
     
@@ -94,6 +214,27 @@ class Upload(Base):
     uploaded_by = Column(String(255), nullable=True)  # Kavita username
 
 
+@event.listens_for(Upload.metadata_json, "set")
+def _sync_metadata_lookup_keys(target, value, oldvalue, initiator):
+    """Keep title_lc/author_lc in step with metadata_json."""
+    for column, key in _metadata_lookup_keys(value).items():
+        setattr(target, column, key)
+
+
+class LibraryFile(Base):
+    """Hash index of files already in the Kavita libraries.
+
+    Rows are keyed by path; mtime and size tell a refresh whether the stored
+    hash is still valid without re-reading the file.
+    """
+    __tablename__ = "library_files"
+
+    path = Column(String, primary_key=True)
+    file_size = Column(BigInteger, nullable=False)
+    mtime = Column(Float, nullable=False)
+    file_hash_sha256 = Column(String(64), nullable=False, index=True)
+
+
 class Database:
     """Database connection manager."""
 
@@ -102,11 +243,27 @@ class Database:
         if database_url is None:
             database_url = get_database_path()
         
+        engine_kwargs = {}
+        if database_url.startswith("sqlite") and ":memory:" not in database_url:
+            # aiosqlite defaults to NullPool for file databases, which opens
+            # a new connection (and re-applies the pragmas) for every session.
+            # Keep a small pool of warm connections instead; the busy timeout
+            # covers writers waiting on each other under WAL.
+            engine_kwargs = {
+                "poolclass": AsyncAdaptedQueuePool,
+                "pool_size": 5,
+                "max_overflow": 10,
+                "connect_args": {"timeout": 30},
+            }
+
         self.engine = create_async_engine(
             database_url,
             echo=False,
             future=True,
+            **engine_kwargs,
         )
+        if self.engine.dialect.name == "sqlite":
+            event.listen(self.engine.sync_engine, "connect", _set_sqlite_pragmas)
         self.async_session_maker = async_sessionmaker(
             self.engine,
             class_=AsyncSession,
@@ -117,43 +274,62 @@ class Database:
         """Automatically migrate database schema by adding missing columns."""
         from app.logger import app_logger
         
-        # Check if uploads table exists
-        result = await conn.execute(text(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='uploads'"
-        ))
-        table_exists = result.fetchone() is not None
+        # Reflect the existing columns in a single pass
+        existing_columns = await conn.run_sync(_reflect_upload_columns)
         
-        if not table_exists:
+        if existing_columns is None:
             # Table doesn't exist, create_all will handle it
             return
         
-        # Get existing columns
-        result = await conn.execute(text("PRAGMA table_info(uploads)"))
-        existing_columns = {row[1] for row in result.fetchall()}
+        missing_columns = [
+            (name, ddl) for name, ddl in _REQUIRED_COLUMNS
+            if name not in existing_columns
+        ]
+        
+        # Add missing columns. These run inside init_db's transaction; the
+        # driver executes one statement per call, so they cannot be sent as
+        # a single script.
+        for column_name, column_type in missing_columns:
+            try:
+                await conn.execute(text(
+                    f"ALTER TABLE uploads ADD COLUMN {column_name} {column_type}"
+                ))
+                app_logger.info(f"Added missing column: {column_name}")
+            except Exception as e:
+                app_logger.error(f"Failed to add column {column_name}: {e}")
+                raise
         
-        # Define required columns with their SQL types (Step 3 & 4 additions + auth)
-        required_columns = {
-            'metadata_json': 'TEXT',
-            'metadata_edited': 'BOOLEAN DEFAULT 0',
-            'metadata_extracted_at': 'DATETIME',
-            'metadata_verified_at': 'DATETIME',
-            'preview_generated': 'BOOLEAN DEFAULT 0',
-            'preview_path': 'VARCHAR(500)',
-            'duplicate_reason': 'VARCHAR(255)',  # Step 4
-            'uploaded_by': 'VARCHAR(255)',  # Authentication: username
-        }
+        if any(name == "title_lc" for name, _ in missing_columns):
+            await self._backfill_metadata_lookup_keys(conn)
         
-        # Add missing columns
-        for column_name, column_type in required_columns.items():
-            if column_name not in existing_columns:
-                try:
-                    await conn.execute(text(
-                        f"ALTER TABLE uploads ADD COLUMN {column_name} {column_type}"
-                    ))
-                    app_logger.info(f"Added missing column: {column_name}")
-                except Exception as e:
-                    app_logger.error(f"Failed to add column {column_name}: {e}")
-                    raise
+        # create_all does not add indexes to a table that already exists
+        await conn.run_sync(_create_missing_indexes)
+
+    async def _backfill_metadata_lookup_keys(self, conn):
+        """Fill title_lc/author_lc for rows written before the columns existed."""
+        uploads = Upload.__table__
+        result = await conn.execute(
+            select(uploads.c.id, uploads.c.metadata_json)
+            .where(uploads.c.metadata_json.isnot(None))
+        )
+        rows = [
+            {"row_id": row_id, **_metadata_lookup_keys(metadata_json)}
+            for row_id, metadata_json in result
+        ]
+        if rows:
+            await conn.execute(
+                update(uploads)
+                .where(uploads.c.id == bindparam("row_id"))
+                .values(title_lc=bindparam("title_lc"), author_lc=bindparam("author_lc")),
+                rows,
+            )
+
+    async def _get_schema_version(self, conn) -> int:
+        """Read the schema version recorded by a previous init_db (0 if none)."""
+        if self.engine.dialect.name != "sqlite":
+            return 0
+        result = await conn.execute(text("PRAGMA user_version"))
+        return result.scalar() or 0
 
     async def init_db(self):
         """Create database tables and migrate schema."""
@@ -161,6 +337,10 @@ class Database:
         
         try:
             async with self.engine.begin() as conn:
+                if await self._get_schema_version(conn) == SCHEMA_VERSION:
+                    app_logger.info("Database schema is up to date")
+                    return
+                
                 # First, create any missing tables
                 await conn.run_sync(Base.metadata.create_all)
                 app_logger.info("Database tables created/verified")
@@ -168,6 +348,9 @@ class Database:
                 # Then, add any missing columns to existing tables
                 await self._migrate_schema(conn)
                 app_logger.info("Database schema migration completed")
+                
+                if self.engine.dialect.name == "sqlite":
+                    await conn.execute(text(f"PRAGMA user_version = {SCHEMA_VERSION}"))
         except Exception as e:
             app_logger.error(f"Database initialization failed: {e}", exc_info=True)
             raise
@@ -178,6 +361,16 @@ class Database:
             yield session
 
 
-# Global database instance
-db = Database()
+@lru_cache(maxsize=1)
+def get_db() -> Database:
+    """Return the process-wide Database, creating the engine on first use."""
+    return Database()
+
+
+def __getattr__(name: str):
+    # Keep ``from app.database import db`` working without building the
+    # engine at import time.
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
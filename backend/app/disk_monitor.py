@@ -5,32 +5,132 @@ Prevents disk exhaustion from excessive uploads.
 
 import asyncio
 import os
+import random
 import shutil
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional, Dict, List, Tuple
-from sqlalchemy import select, func
+from typing import Any, Optional, Dict, List, Tuple
+from sqlalchemy import Row, select, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import config
-from app.database import Upload
+from app.database import Upload, get_db
 from app.logger import app_logger
 
+# Number of quarantine files deleted concurrently (in worker threads) per
+# cleanup batch.
+CLEANUP_BATCH_SIZE = 128
+
+# Candidate rows fetched from the database per streamed partition.
+CLEANUP_FETCH_SIZE = 500
+
+# Statuses whose files count toward the quarantine size limit
+QUARANTINE_STATUSES = ("quarantined", "scanning")
+
+# Admission checks run on every upload; during bursts the disk usage and the
+# quarantine total are reused for a few seconds instead of re-queried.
+DISK_USAGE_TTL_SECONDS = 2.0
+QUARANTINE_SIZE_TTL_SECONDS = 5.0
+_QUARANTINE_SIZE_KEY = "quarantine_size"
+
+# key -> (monotonic timestamp, value)
+_cache: Dict[str, Tuple[float, Any]] = {}
+
+
+def _cache_get(key: str, ttl: float) -> Optional[Any]:
+    """Return a cached value younger than ``ttl`` seconds, else None."""
+    entry = _cache.get(key)
+    if entry is not None and time.monotonic() - entry[0] < ttl:
+        return entry[1]
+    return None
+
+
+def _cache_set(key: str, value: Any) -> None:
+    _cache[key] = (time.monotonic(), value)
+
+
+# Columns cleanup needs; selected as plain rows instead of full Upload objects.
+_CLEANUP_COLUMNS = (
+    Upload.id,
+    Upload.uuid,
+    Upload.quarantine_path,
+    Upload.file_size,
+    Upload.uploaded_at,
+    Upload.status,
+)
+
+
+def _unlink(path: str) -> bool:
+    """Delete a file, returning False if it did not exist."""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+async def _delete_files(paths: List[str]) -> list:
+    """Delete files concurrently off the event loop.
+
+    Returns one entry per path: True if deleted, False if the file was
+    already gone, or the exception raised while deleting it.
+    """
+    return await asyncio.gather(
+        *(asyncio.to_thread(_unlink, path) for path in paths),
+        return_exceptions=True,
+    )
+
+
+def _take_batch(uploads: List[Row], start: int, bytes_needed: Optional[int]) -> List[Row]:
+    """Slice the next cleanup batch, stopping early once the recorded sizes
+    cover ``bytes_needed`` so a byte target is not overshot by a whole batch.
+    """
+    batch = uploads[start:start + CLEANUP_BATCH_SIZE]
+    if bytes_needed is None:
+        return batch
+    expected = 0
+    for count, upload in enumerate(batch, 1):
+        expected += upload.file_size or 0
+        if expected >= bytes_needed:
+            return batch[:count]
+    return batch
+
+
+async def _mark_cleaned(db_session: AsyncSession, ids: List[int], status: str, message: str):
+    """Set status/error_message on the given uploads, one UPDATE per fetch-sized slice."""
+    for start in range(0, len(ids), CLEANUP_FETCH_SIZE):
+        await db_session.execute(
+            update(Upload)
+            .where(Upload.id.in_(ids[start:start + CLEANUP_FETCH_SIZE]))
+            .values(status=status, error_message=message)
+        )
+
 
 class DiskMonitor:
     """Monitor and manage disk space to prevent exhaustion."""
     
     @staticmethod
-    def get_disk_usage(path: Path) -> Dict[str, int]:
-        """Get disk usage statistics for a given path."""
+    async def get_disk_usage(path: Path) -> Dict[str, int]:
+        """Get disk usage statistics for a given path (cached briefly).
+        
+        statvfs can block for a long time on network filesystems, so it runs
+        in a worker thread.
+        """
+        key = f"disk_usage:{path}"
+        cached = _cache_get(key, DISK_USAGE_TTL_SECONDS)
+        if cached is not None:
+            return cached
         try:
-            stat = shutil.disk_usage(path)
-            return {
+            stat = await asyncio.to_thread(shutil.disk_usage, path)
+            usage = {
                 "total": stat.total,
                 "used": stat.used,
                 "free": stat.free,
                 "percent_used": (stat.used / stat.total * 100) if stat.total > 0 else 0
             }
+            _cache_set(key, usage)
+            return usage
         except Exception as e:
             app_logger.error(f"Failed to get disk usage for {path}: {e}")
             return {
@@ -41,7 +141,7 @@ class DiskMonitor:
             }
     
     @staticmethod
-    def check_disk_space_available(
+    async def check_disk_space_available(
         path: Path,
         required_bytes: int,
         min_free_percent: float = None
@@ -60,7 +160,7 @@ class DiskMonitor:
         if min_free_percent is None:
             min_free_percent = config.disk_protection.min_free_space_percent
         
-        usage = DiskMonitor.get_disk_usage(path)
+        usage = await DiskMonitor.get_disk_usage(path)
         
         # Check 1: Absolute space requirement
         if usage["free"] < required_bytes:
@@ -95,14 +195,23 @@ class DiskMonitor:
     
     @staticmethod
     async def get_quarantine_size(db_session: AsyncSession) -> int:
-        """Get total size of all files in quarantine."""
+        """Get total size of all files in quarantine (cached briefly)."""
+        cached = _cache_get(_QUARANTINE_SIZE_KEY, QUARANTINE_SIZE_TTL_SECONDS)
+        if cached is not None:
+            return cached
         result = await db_session.execute(
             select(func.sum(Upload.file_size)).where(
-                Upload.status.in_(["quarantined", "scanning"])
+                Upload.status.in_(QUARANTINE_STATUSES)
             )
         )
-        total_size = result.scalar()
-        return total_size or 0
+        total_size = result.scalar() or 0
+        _cache_set(_QUARANTINE_SIZE_KEY, total_size)
+        return total_size
+    
+    @staticmethod
+    def invalidate_quarantine_cache() -> None:
+        """Drop the cached quarantine size after files are added or removed."""
+        _cache.pop(_QUARANTINE_SIZE_KEY, None)
     
     @staticmethod
     async def check_quarantine_limit(
@@ -166,11 +275,14 @@ class DiskMonitor:
         if max_age_hours <= 0:
             return 0  # Auto-cleanup disabled
         
-        cutoff_time = datetime.utcnow() - timedelta(hours=max_age_hours)
+        now = datetime.utcnow()
+        cutoff_time = now - timedelta(hours=max_age_hours)
         
-        # Find old files in quarantine or failed states
-        result = await db_session.execute(
-            select(Upload)
+        # Find old files in quarantine or failed states. Rows are streamed so
+        # deletion starts with the first partition instead of after loading
+        # every candidate.
+        result = await db_session.stream(
+            select(*_CLEANUP_COLUMNS)
             .where(
                 Upload.uploaded_at < cutoff_time,
                 Upload.status.in_([
@@ -181,48 +293,67 @@ class DiskMonitor:
                 ])
             )
             .order_by(Upload.uploaded_at.asc())  # Oldest first
+            .execution_options(yield_per=CLEANUP_FETCH_SIZE)
         )
         
-        old_uploads = result.scalars().all()
         bytes_freed = 0
         files_deleted = 0
+        cleaned_ids = []
         
-        for upload in old_uploads:
-            try:
-                # Delete physical file
-                quarantine_path = Path(upload.quarantine_path)
-                if quarantine_path.exists():
-                    file_size = quarantine_path.stat().st_size
-                    quarantine_path.unlink()
-                    bytes_freed += file_size
-                    files_deleted += 1
-                    
-                    app_logger.info(
-                        f"Auto-cleanup: Deleted old file (age: {(datetime.utcnow() - upload.uploaded_at).days} days)",
-                        extra={
-                            "upload_uuid": upload.uuid,
-                            "file_size": file_size,
-                            "status": upload.status,
-                            "age_hours": (datetime.utcnow() - upload.uploaded_at).total_seconds() / 3600
-                        }
-                    )
-                
-                # Update database status
-                upload.status = "auto_deleted"
-                upload.error_message = f"Auto-deleted after {max_age_hours} hours"
-                
+        async for old_uploads in result.partitions():
+            index = 0
+            while index < len(old_uploads):
                 # Check if we've freed enough space
                 if target_bytes_to_free and bytes_freed >= target_bytes_to_free:
                     break
-                    
-            except Exception as e:
-                app_logger.error(
-                    f"Failed to delete old file during cleanup: {e}",
-                    exc_info=True,
-                    extra={"upload_uuid": upload.uuid}
+                
+                batch = _take_batch(
+                    old_uploads,
+                    index,
+                    target_bytes_to_free - bytes_freed if target_bytes_to_free else None,
                 )
+                index += len(batch)
+                results = await _delete_files([upload.quarantine_path for upload in batch])
+                
+                for upload, deleted in zip(batch, results):
+                    if isinstance(deleted, Exception):
+                        app_logger.error(
+                            f"Failed to delete old file during cleanup: {deleted}",
+                            exc_info=deleted,
+                            extra={"upload_uuid": upload.uuid}
+                        )
+                        continue
+                    
+                    if deleted:
+                        # The size was recorded at upload time; no need to stat
+                        file_size = upload.file_size or 0
+                        bytes_freed += file_size
+                        files_deleted += 1
+                        
+                        age = now - upload.uploaded_at
+                        app_logger.info(
+                            f"Auto-cleanup: Deleted old file (age: {age.days} days)",
+                            extra={
+                                "upload_uuid": upload.uuid,
+                                "file_size": file_size,
+                                "status": upload.status,
+                                "age_hours": age.total_seconds() / 3600
+                            }
+                        )
+                    
+                    cleaned_ids.append(upload.id)
+            
+            if target_bytes_to_free and bytes_freed >= target_bytes_to_free:
+                break
+        await result.close()
         
+        # Status updates wait until the stream is closed so rows are not
+        # modified underneath the open cursor
+        await _mark_cleaned(
+            db_session, cleaned_ids, "auto_deleted", f"Auto-deleted after {max_age_hours} hours"
+        )
         await db_session.commit()
+        DiskMonitor.invalidate_quarantine_cache()
         
         if files_deleted > 0:
             app_logger.info(
@@ -250,9 +381,9 @@ class DiskMonitor:
         """
         app_logger.warning("EMERGENCY CLEANUP TRIGGERED - Disk critically low")
         
-        # Get all quarantine files, oldest first
-        result = await db_session.execute(
-            select(Upload)
+        # Stream all quarantine files, oldest first
+        result = await db_session.stream(
+            select(*_CLEANUP_COLUMNS)
             .where(
                 Upload.status.in_([
                     "quarantined",
@@ -261,44 +392,55 @@ class DiskMonitor:
                 ])
             )
             .order_by(Upload.uploaded_at.asc())
+            .execution_options(yield_per=CLEANUP_FETCH_SIZE)
         )
         
-        uploads = result.scalars().all()
         bytes_freed = 0
         files_deleted = 0
-        
-        for upload in uploads:
+        cleaned_ids = []
+        
+        async for uploads in result.partitions():
+            index = 0
+            while index < len(uploads) and bytes_freed < target_free_bytes:
+                batch = _take_batch(uploads, index, target_free_bytes - bytes_freed)
+                index += len(batch)
+                results = await _delete_files([upload.quarantine_path for upload in batch])
+                
+                for upload, deleted in zip(batch, results):
+                    if isinstance(deleted, Exception):
+                        app_logger.error(
+                            f"Failed to delete file during emergency cleanup: {deleted}",
+                            exc_info=deleted,
+                            extra={"upload_uuid": upload.uuid}
+                        )
+                        continue
+                    
+                    if deleted:
+                        # The size was recorded at upload time; no need to stat
+                        file_size = upload.file_size or 0
+                        bytes_freed += file_size
+                        files_deleted += 1
+                        
+                        app_logger.warning(
+                            f"Emergency cleanup: Deleted file",
+                            extra={
+                                "upload_uuid": upload.uuid,
+                                "file_size": file_size,
+                                "original_status": upload.status
+                            }
+                        )
+                    
+                    cleaned_ids.append(upload.id)
+            
             if bytes_freed >= target_free_bytes:
                 break
-            
-            try:
-                quarantine_path = Path(upload.quarantine_path)
-                if quarantine_path.exists():
-                    file_size = quarantine_path.stat().st_size
-                    quarantine_path.unlink()
-                    bytes_freed += file_size
-                    files_deleted += 1
-                    
-                    app_logger.warning(
-                        f"Emergency cleanup: Deleted file",
-                        extra={
-                            "upload_uuid": upload.uuid,
-                            "file_size": file_size,
-                            "original_status": upload.status
-                        }
-                    )
-                
-                upload.status = "emergency_deleted"
-                upload.error_message = "Deleted during emergency disk cleanup"
-                
-            except Exception as e:
-                app_logger.error(
-                    f"Failed to delete file during emergency cleanup: {e}",
-                    exc_info=True,
-                    extra={"upload_uuid": upload.uuid}
-                )
+        await result.close()
         
+        await _mark_cleaned(
+            db_session, cleaned_ids, "emergency_deleted", "Deleted during emergency disk cleanup"
+        )
         await db_session.commit()
+        DiskMonitor.invalidate_quarantine_cache()
         
         app_logger.warning(
             f"Emergency cleanup completed: {files_deleted} files, {bytes_freed:,} bytes freed",
@@ -311,15 +453,21 @@ class DiskMonitor:
     async def get_disk_status(db_session: AsyncSession) -> Dict:
         """Get comprehensive disk status information."""
         quarantine_path = Path(config.quarantine_dir)
-        disk_usage = DiskMonitor.get_disk_usage(quarantine_path)
-        quarantine_size = await DiskMonitor.get_quarantine_size(db_session)
+        disk_usage = await DiskMonitor.get_disk_usage(quarantine_path)
         
-        # Count files by status
+        # Count files and sum their sizes by status in one query; the
+        # quarantine size falls out of the same rows
         result = await db_session.execute(
-            select(Upload.status, func.count(Upload.id))
+            select(Upload.status, func.count(Upload.id), func.coalesce(func.sum(Upload.file_size), 0))
             .group_by(Upload.status)
         )
-        status_counts = {row[0]: row[1] for row in result.all()}
+        status_counts = {}
+        quarantine_size = 0
+        for status, count, total_size in result.all():
+            status_counts[status] = count
+            if status in QUARANTINE_STATUSES:
+                quarantine_size += total_size
+        _cache_set(_QUARANTINE_SIZE_KEY, quarantine_size)
         
         return {
             "disk": disk_usage,
@@ -343,14 +491,25 @@ class DiskMonitor:
 
 
 # Background cleanup task
-async def periodic_cleanup_task(db_session: AsyncSession):
-    """Background task to periodically clean up old files."""
+async def periodic_cleanup_task():
+    """Background task to periodically clean up old files.
+    
+    Each run uses its own short-lived session from the shared engine rather
+    than holding one connection for the life of the process. The interval is
+    jittered by up to 10% so the cleanup does not line up with other
+    periodic work.
+    """
     while True:
         try:
-            await asyncio.sleep(config.disk_protection.cleanup_interval_minutes * 60)
+            interval = config.disk_protection.cleanup_interval_minutes * 60
+            await asyncio.sleep(interval + random.uniform(-0.1, 0.1) * interval)
+            
+            if not config.disk_protection.auto_cleanup_enabled:
+                continue
             
             app_logger.info("Running periodic quarantine cleanup")
-            bytes_freed = await DiskMonitor.cleanup_old_files(db_session)
+            async with get_db().async_session_maker() as db_session:
+                bytes_freed = await DiskMonitor.cleanup_old_files(db_session)
             
             if bytes_freed > 0:
                 app_logger.info(f"Periodic cleanup freed {bytes_freed:,} bytes")
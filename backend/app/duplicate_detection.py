@@ -1,11 +1,13 @@
 """Hash-based duplicate detection service."""
 
+import asyncio
 from typing import Optional, Dict, Any, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, or_, select
 from pathlib import Path
 
-from app.database import Upload
+from app.database import Upload, get_db
+from app.library_index import LibraryIndex
 from app.config import config
 from app.logger import app_logger
 
@@ -35,14 +37,36 @@ class DuplicateDetector:
                 "reason": "duplicate_detection_disabled"
             }
         
-        # Primary check: hash-based
-        if config.duplicate_detection.check_by_hash:
+        # A missing hash would compare as IS NULL and match every unhashed row
+        check_by_hash = config.duplicate_detection.check_by_hash and file_hash is not None
+        check_by_size = config.duplicate_detection.check_by_size
+        conditions = []
+        if check_by_hash:
+            conditions.append(Upload.file_hash_sha256 == file_hash)
+        if check_by_size:
+            conditions.append(Upload.file_size == file_size)
+        
+        if conditions:
+            # One round-trip for both checks. Hash matches sort first, oldest
+            # upload first, so only the first row is fetched; the window
+            # count reports how many rows matched without loading them.
             result = await db_session.execute(
-                select(Upload).where(Upload.file_hash_sha256 == file_hash)
+                select(
+                    Upload.uuid,
+                    Upload.file_hash_sha256,
+                    Upload.original_filename,
+                    Upload.status,
+                    Upload.uploaded_at,
+                    func.count().over().label("candidate_count"),
+                )
+                .where(or_(*conditions))
+                .order_by((Upload.file_hash_sha256 == file_hash).desc(), Upload.uploaded_at.asc())
+                .limit(1)
             )
-            existing = result.scalar_one_or_none()
+            existing = result.first()
             
-            if existing:
+            # Primary check: hash-based
+            if check_by_hash and existing and existing.file_hash_sha256 == file_hash:
                 app_logger.info(
                     f"Duplicate file detected by hash",
                     extra={
@@ -61,17 +85,12 @@ class DuplicateDetector:
                     "uploaded_at": existing.uploaded_at.isoformat(),
                     "action": "discard" if config.duplicate_detection.discard_exact_hash else "allow"
                 }
-        
-        # Secondary check: size-based (for performance)
-        if config.duplicate_detection.check_by_size:
-            result = await db_session.execute(
-                select(Upload).where(Upload.file_size == file_size)
-            )
-            possible_duplicates = result.scalars().all()
             
-            if possible_duplicates:
+            # Secondary check: size-based (for performance). No hash match
+            # sorted first, so every counted row is a same-size file.
+            if check_by_size and existing:
                 app_logger.info(
-                    f"Found {len(possible_duplicates)} files with same size",
+                    f"Found {existing.candidate_count} files with same size",
                     extra={
                         "file_size": file_size,
                         "file_hash": file_hash
@@ -86,30 +105,23 @@ class DuplicateDetector:
         }
     
     @staticmethod
-    async def check_library_duplicates(
-        file_hash: str,
-        library_path: Optional[str] = None
-    ) -> Dict[str, Any]:
-        """Check if file exists in Kavita library by hash.
+    async def get_library_search_paths(library_path: Optional[str] = None) -> List[str]:
+        """Resolve the library directories to check for duplicates.
         
         Uses Kavita API to get library paths if available, otherwise uses config.
         
         Args:
-            file_hash: SHA256 hash of file
-            library_path: Path to Kavita library (defaults to API or config)
+            library_path: Explicit library path (used when the API has none)
             
         Returns:
-            Dictionary with library duplicate status
+            List of library directories
         """
-        # Try to get libraries from Kavita API if enabled
-        search_paths = []
-        
         if config.kavita.enabled:
             try:
                 from app.kavita_api import kavita_api
                 library_paths = await kavita_api.get_library_paths()
                 if library_paths:
-                    search_paths = library_paths
+                    return library_paths
             except Exception as e:
                 app_logger.debug(
                     f"Failed to fetch libraries from API, using config",
@@ -117,14 +129,33 @@ class DuplicateDetector:
                 )
         
         # Fallback to config if API not available
-        if not search_paths:
-            if library_path:
-                search_paths = [library_path]
-            else:
-                # Use config libraries
-                search_paths = config.moving.kavita_library_dirs if hasattr(config.moving, 'kavita_library_dirs') else []
-                if config.folders.library:
-                    search_paths.append(config.folders.library)
+        if library_path:
+            return [library_path]
+        search_paths = list(config.moving.kavita_library_dirs)
+        if config.folders.library:
+            search_paths.append(config.folders.library)
+        return search_paths
+    
+    @staticmethod
+    async def check_library_duplicates(
+        file_hash: str,
+        db_session: AsyncSession,
+        library_path: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Check if file exists in Kavita library by hash.
+        
+        Looks the hash up in the library index maintained by
+        library_index_refresh_task rather than walking the libraries.
+        
+        Args:
+            file_hash: SHA256 hash of file
+            db_session: Database session
+            library_path: Path to Kavita library (defaults to API or config)
+            
+        Returns:
+            Dictionary with library duplicate status
+        """
+        search_paths = await DuplicateDetector.get_library_search_paths(library_path)
         
         if not search_paths:
             return {
@@ -132,17 +163,13 @@ class DuplicateDetector:
                 "reason": "no_libraries_configured"
             }
         
-        # Check each library path for duplicates
-        from app.mover_service import MoverService
-        is_duplicate, duplicate_path = await MoverService.check_duplicates_in_filesystem(
-            file_hash,
-            search_paths
-        )
+        duplicate_path = await LibraryIndex.find(db_session, file_hash, search_paths)
+        is_duplicate = duplicate_path is not None
         
         return {
             "in_library": is_duplicate,
             "reason": "hash_match" if is_duplicate else "not_found",
-            "duplicate_path": duplicate_path if is_duplicate else None
+            "duplicate_path": duplicate_path
         }
     
     @staticmethod
@@ -193,3 +220,22 @@ class DuplicateDetector:
         
         return None
 
+
+# Background library index refresh
+async def library_index_refresh_task():
+    """Background task keeping the library hash index up to date.
+
+    Runs a refresh at startup and then every
+    ``duplicate_detection.library_index_refresh_minutes``.
+    """
+    while True:
+        try:
+            search_paths = await DuplicateDetector.get_library_search_paths()
+            if search_paths:
+                async with get_db().async_session_maker() as db_session:
+                    await LibraryIndex.refresh(db_session, search_paths)
+                    await db_session.commit()
+        except Exception as e:
+            app_logger.error(f"Library index refresh failed: {e}", exc_info=True)
+        
+        await asyncio.sleep(config.duplicate_detection.library_index_refresh_minutes * 60)
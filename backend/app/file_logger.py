@@ -1,14 +1,118 @@
 """Per-file logging system for detailed debugging."""
 
+import atexit
 import logging
 import json
+import os
+import queue
+import threading
 from pathlib import Path
 from datetime import datetime
 from typing import Any, Dict, Optional
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 from app.config import config
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def _isoformat(moment: datetime) -> str:
+    """Format a naive UTC datetime as an ISO 8601 string with millisecond precision."""
+    return moment.isoformat(timespec="milliseconds") + "Z"
+
+
+def _dumps(data: Dict[str, Any]) -> str:
+    """Serialize event data as compact single-line JSON."""
+    if HAS_ORJSON:
+        return orjson.dumps(data, default=str).decode()
+    return json.dumps(data, separators=(",", ":"), default=str)
+
+
+# Simple text formatter for readability, shared by every per-upload file
+_FORMATTER = logging.Formatter(
+    '%(asctime)s [%(levelname)s] %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+class _PerFileHandler(logging.Handler):
+    """Listener-side handler routing each record to its upload's log file.
+
+    File handlers (and the log directory) are created on the first record
+    for a path and closed when the upload's logger is finalized, so all
+    file-system work happens on the listener thread.
+    """
+    
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self._handlers: Dict[str, RotatingFileHandler] = {}
+    
+    def emit(self, record: logging.LogRecord):
+        # An exception escaping here would kill the shared listener thread
+        # and silently stall every upload's log, so report it and carry on
+        try:
+            path = record.log_file
+            handler = self._handlers.get(path)
+            if handler is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                handler = RotatingFileHandler(
+                    path,
+                    maxBytes=5242880,  # 5MB
+                    backupCount=1,
+                )
+                handler.setFormatter(_FORMATTER)
+                self._handlers[path] = handler
+            handler.handle(record)
+            if getattr(record, "close_log", False):
+                self._handlers.pop(path).close()
+        except Exception:
+            self.handleError(record)
+    
+    def close(self):
+        for handler in self._handlers.values():
+            handler.close()
+        self._handlers.clear()
+        super().close()
+
+
+# All uploads log through one queue; a single listener thread does the file
+# I/O, so logging from request handlers never blocks on disk.
+_logger = logging.getLogger("file")
+_logger.setLevel(logging.DEBUG)
+_logger.propagate = False  # Don't propagate to root logger
+_listener: Optional[QueueListener] = None
+_listener_lock = threading.Lock()
+
+
+def _ensure_listener():
+    """Start the shared queue listener on first use."""
+    global _listener
+    if _listener is not None:
+        return
+    with _listener_lock:
+        if _listener is None:
+            log_queue = queue.SimpleQueue()
+            _logger.addHandler(QueueHandler(log_queue))
+            _listener = QueueListener(log_queue, _PerFileHandler())
+            _listener.start()
+
+
+@atexit.register
+def _stop_listener():
+    """Flush queued records and close all open per-upload files."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _logger.handlers.clear()
+            _listener = None
+
 
 class FileLogger:
     """Creates individual log files for each uploaded file."""
@@ -23,53 +127,26 @@ class FileLogger:
         self.upload_uuid = upload_uuid
         self.original_filename = original_filename
         self.log_dir = Path("logs/files")
-        self.log_dir.mkdir(parents=True, exist_ok=True)
         
         # Create log file path
         safe_uuid = upload_uuid[:8]  # Use first 8 chars for readability
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        started_at = datetime.utcnow()
+        timestamp = started_at.strftime("%Y%m%d_%H%M%S")
         self.log_file = self.log_dir / f"{timestamp}_{safe_uuid}.log"
+        self._extra = {"log_file": str(self.log_file)}
         
-        # Initialize logger
-        self.logger = self._setup_logger()
+        _ensure_listener()
         
         # Write header
         self.log_event("upload_started", {
             "uuid": upload_uuid,
             "filename": original_filename,
-            "timestamp": datetime.utcnow().isoformat() + "Z"
+            "timestamp": _isoformat(started_at)
         })
     
-    def _setup_logger(self) -> logging.Logger:
-        """Setup dedicated logger for this file.
-        
-        Returns:
-            Configured logger
-        """
-        logger_name = f"file.{self.upload_uuid}"
-        logger = logging.getLogger(logger_name)
-        logger.setLevel(logging.DEBUG)
-        logger.handlers = []  # Clear existing handlers
-        
-        # File handler
-        handler = RotatingFileHandler(
-            self.log_file,
-            maxBytes=5242880,  # 5MB
-            backupCount=1,
-        )
-        handler.setLevel(logging.DEBUG)
-        
-        # Simple text formatter for readability
-        formatter = logging.Formatter(
-            '%(asctime)s [%(levelname)s] %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        handler.setFormatter(formatter)
-        
-        logger.addHandler(handler)
-        logger.propagate = False  # Don't propagate to root logger
-        
-        return logger
+    def _log(self, level: int, message: str, exc_info: bool = False):
+        """Queue a record for this upload's log file."""
+        _logger.log(level, message, exc_info=exc_info, extra=self._extra)
     
     def log_event(self, event_type: str, data: Dict[str, Any]):
         """Log an event with structured data.
@@ -78,8 +155,8 @@ class FileLogger:
             event_type: Type of event (e.g., "upload_started", "scan_complete")
             data: Event data
         """
-        message = f"[{event_type.upper()}] {json.dumps(data, indent=2)}"
-        self.logger.info(message)
+        message = f"[{event_type.upper()}] {_dumps(data)}"
+        self._log(logging.INFO, message)
     
     def log_phase(self, phase: str, status: str, details: Optional[Dict[str, Any]] = None):
         """Log a processing phase.
@@ -92,7 +169,7 @@ class FileLogger:
         data = {
             "phase": phase,
             "status": status,
-            "timestamp": datetime.utcnow().isoformat() + "Z"
+            "timestamp": _isoformat(datetime.utcnow())
         }
         if details:
             data.update(details)
@@ -108,7 +185,7 @@ class FileLogger:
         """
         data = {
             "error": error,
-            "timestamp": datetime.utcnow().isoformat() + "Z"
+            "timestamp": _isoformat(datetime.utcnow())
         }
         
         if exception:
@@ -118,7 +195,7 @@ class FileLogger:
         self.log_event("error", data)
         
         if exception:
-            self.logger.exception(f"Exception details: {exception}")
+            self._log(logging.ERROR, f"Exception details: {exception}", exc_info=True)
     
     def log_scan_progress(
         self,
@@ -136,13 +213,13 @@ class FileLogger:
         data = {
             "scan_phase": phase,
             "status": status,
-            "timestamp": datetime.utcnow().isoformat() + "Z"
+            "timestamp": _isoformat(datetime.utcnow())
         }
         
         if details:
             data.update(details)
         
-        self.logger.info(f"[SCAN:{phase.upper()}] {json.dumps(data, indent=2)}")
+        self._log(logging.INFO, f"[SCAN:{phase.upper()}] {_dumps(data)}")
     
     def finalize(self, final_status: str, details: Optional[Dict[str, Any]] = None):
         """Write final status and close log.
@@ -153,21 +230,17 @@ class FileLogger:
         """
         data = {
             "final_status": final_status,
-            "timestamp": datetime.utcnow().isoformat() + "Z"
+            "timestamp": _isoformat(datetime.utcnow())
         }
         
         if details:
             data.update(details)
         
         self.log_event("upload_finalized", data)
-        self.logger.info("=" * 80)
-        self.logger.info(f"FINAL STATUS: {final_status}")
-        self.logger.info("=" * 80)
-        
-        # Close handlers
-        for handler in self.logger.handlers:
-            handler.close()
-            self.logger.removeHandler(handler)
+        self._log(logging.INFO, "=" * 80)
+        self._log(logging.INFO, f"FINAL STATUS: {final_status}")
+        # The last record also tells the listener to close this file
+        _logger.info("=" * 80, extra={**self._extra, "close_log": True})
     
     @staticmethod
     def get_log_file_for_upload(upload_uuid: str) -> Optional[Path]:
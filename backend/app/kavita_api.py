@@ -1,38 +1,178 @@
 """Kavita API client for fetching library information."""
 
+import asyncio
+import json
+import os
+import time
 import httpx
-from typing import List, Dict, Any, Optional
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from types import MappingProxyType
+from typing import List, Dict, Any, Mapping, Optional, Tuple
 from fastapi import HTTPException
 
 from app.config import config
 from app.logger import app_logger
 
+# Optional import for faster JSON parsing
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Optional import for HTTP/2 (httpx needs h2 to negotiate it)
+try:
+    import h2  # noqa: F401
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+
+def _loads(content: bytes) -> Any:
+    """Parse a JSON response body."""
+    if HAS_ORJSON:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+# Shared by the library and auth calls so requests reuse pooled keep-alive
+# connections (multiplexed over HTTP/2 when h2 is installed and the server
+# offers it over TLS) instead of paying a TCP/TLS handshake each time
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared Kavita HTTP client, creating it on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            # The client is shared by every user's login and API-key check,
+            # so it must never store a cookie and replay it for someone else
+            cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+            verify=config.kavita.verify_ssl,
+            timeout=config.kavita.timeout,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            http2=HAS_H2,
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared Kavita HTTP client (called on application shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def _folder_path(folder: Any) -> Optional[str]:
+    """Path of a folder entry, which is either a string or an object."""
+    if isinstance(folder, dict):
+        return folder.get("path") or folder.get("folder") or folder.get("folderPath")
+    if isinstance(folder, str):
+        return folder
+    return None
+
+
+def _parse_libraries(data: Any) -> List[Dict[str, Any]]:
+    """Flatten a ``/api/Library/list`` response into one entry per folder.
+
+    Each library's id, name and type are read once and shared by all of its
+    folders; libraries without folders fall back to a direct ``path``.
+
+    Args:
+        data: Decoded response body
+
+    Returns:
+        List of ``{"id", "name", "path", "type"}`` dictionaries
+    """
+    # Handle different response formats
+    libraries = data if isinstance(data, list) else data.get("data", data.get("libraries", []))
+    
+    library_list = []
+    for lib in libraries:
+        if isinstance(lib, str):
+            # If library is just a path string
+            library_list.append({"path": lib, "name": lib, "id": None, "type": "Unknown"})
+            continue
+        if not isinstance(lib, dict):
+            continue
+        
+        # Kavita API returns libraries with folders array
+        # Each library can have multiple folders (rootFolders or folders field)
+        folders = lib.get("folders") or lib.get("rootFolders") or lib.get("folderPaths") or []
+        if not isinstance(folders, list):
+            folders = [folders]
+        paths = [path for path in map(_folder_path, folders) if path]
+        
+        # If no folders found but library has a direct path
+        if not paths:
+            direct_path = lib.get("path") or lib.get("folderPath")
+            if direct_path:
+                paths = [direct_path]
+        
+        lib_id = lib.get("id")
+        name = lib.get("name", "Unknown")
+        lib_type = lib.get("type", lib.get("libraryType", "Unknown"))
+        library_list.extend(
+            {"id": lib_id, "name": name, "path": path, "type": lib_type}
+            for path in paths
+        )
+    return library_list
+
+
+def _resolve_library_path(path: str) -> Optional[str]:
+    """Absolute form of a library path, or None if a relative path does not exist."""
+    try:
+        resolved = os.path.abspath(os.path.expanduser(path))
+        # Absolute paths are kept as-is, so only relative ones need a stat
+        if os.path.isabs(path) or os.path.exists(resolved):
+            return resolved
+        app_logger.warning(
+            f"Library path does not exist, skipping",
+            extra={"path": path, "resolved": resolved}
+        )
+    except Exception as e:
+        app_logger.warning(
+            f"Error resolving library path: {path}",
+            extra={"error": str(e)}
+        )
+    return None
+
 
 class KavitaAPIClient:
     """Client for interacting with Kavita API."""
     
     def __init__(self):
         self.kavita_url = config.kavita.server_url.rstrip('/')
+        # Use the documented Kavita API endpoint: /api/Library/list
+        # Reference: https://www.kavitareader.com/docs/api/
+        self._list_url = f"{self.kavita_url}/api/Library/list"
         self.verify_ssl = config.kavita.verify_ssl
         self.timeout = config.kavita.timeout
         self.api_key = config.kavita.api_key if config.kavita.use_api_key else None
         self._libraries_cache: Optional[List[Dict[str, Any]]] = None
-        self._cache_timestamp: Optional[float] = None
-        self._cache_ttl = 300  # Cache for 5 minutes
+        self._cache_timestamp = 0.0
+        self._cache_ttl = 300  # Fresh for 5 minutes
+        self._cache_hard_ttl = 900  # Served stale while refreshing for up to 15 minutes
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._resolved_paths: Optional[Tuple[List[Dict[str, Any]], List[str]]] = None
+        # The API key is fixed for the client's lifetime, so build the headers once
+        self._auth_headers = MappingProxyType(
+            {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        )
     
-    def _get_auth_headers(self) -> Dict[str, str]:
+    def _get_auth_headers(self) -> Mapping[str, str]:
         """Get authentication headers for API requests."""
-        headers = {}
-        
-        if self.api_key:
-            headers["Authorization"] = f"Bearer {self.api_key}"
-        
-        return headers
+        return self._auth_headers
     
     async def get_libraries(self, force_refresh: bool = False) -> List[Dict[str, Any]]:
         """Fetch libraries from Kavita API.
         
-        Results are cached for 5 minutes to reduce API calls.
+        Results are fresh for 5 minutes. Between 5 and 15 minutes the cached
+        list is returned while a single background task refreshes it; after
+        that callers wait for one shared refresh.
         
         Args:
             force_refresh: Force cache refresh even if cached
@@ -43,129 +183,98 @@ class KavitaAPIClient:
         Raises:
             HTTPException: If API call fails
         """
-        import time
-        
-        # Check cache first
-        if not force_refresh and self._libraries_cache is not None and self._cache_timestamp:
-            if time.time() - self._cache_timestamp < self._cache_ttl:
+        if not force_refresh and self._libraries_cache is not None:
+            age = time.monotonic() - self._cache_timestamp
+            if age < self._cache_ttl:
                 app_logger.debug(
-                    f"Returning cached libraries",
+                    "Returning cached libraries",
                     extra={"count": len(self._libraries_cache)}
                 )
                 return self._libraries_cache
+            if age < self._cache_hard_ttl:
+                if self._refresh_task is None or self._refresh_task.done():
+                    self._refresh_task = asyncio.create_task(self._refresh_in_background())
+                return self._libraries_cache
         
+        async with self._refresh_lock:
+            # Another caller may have refreshed while we waited for the lock
+            if (
+                not force_refresh
+                and self._libraries_cache is not None
+                and time.monotonic() - self._cache_timestamp < self._cache_ttl
+            ):
+                return self._libraries_cache
+            return await self._fetch_libraries()
+    
+    async def _refresh_in_background(self) -> None:
+        """Refresh a stale libraries cache, keeping the old list on failure."""
+        async with self._refresh_lock:
+            if time.monotonic() - self._cache_timestamp < self._cache_ttl:
+                return
+            try:
+                await self._fetch_libraries()
+            except HTTPException as e:
+                app_logger.warning(
+                    "Background library refresh failed, serving cached libraries",
+                    extra={"error": e.detail}
+                )
+    
+    async def _fetch_libraries(self) -> List[Dict[str, Any]]:
+        """Fetch libraries from the Kavita API and update the cache.
+        
+        Raises:
+            HTTPException: If API call fails
+        """
         if not config.kavita.enabled:
             app_logger.warning("Kavita is not enabled, cannot fetch libraries")
             return []
         
         try:
-            async with httpx.AsyncClient(verify=self.verify_ssl, timeout=self.timeout) as client:
-                # Use the documented Kavita API endpoint: /api/Library/list
-                # Reference: https://www.kavitareader.com/docs/api/
-                url = f"{self.kavita_url}/api/Library/list"
-                headers = self._get_auth_headers()
+            url = self._list_url
+            headers = self._get_auth_headers()
+            
+            app_logger.debug(
+                "Fetching libraries from Kavita API",
+                extra={"url": url}
+            )
+            
+            response = await get_http_client().get(url, headers=headers)
+            
+            if response.status_code == 200:
+                data = _loads(response.content)
                 
-                app_logger.debug(
-                    f"Fetching libraries from Kavita API",
-                    extra={"url": url}
-                )
+                library_list = _parse_libraries(data)
                 
-                response = await client.get(url, headers=headers)
+                # Cache the results
+                self._libraries_cache = library_list
+                self._cache_timestamp = time.monotonic()
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    # Handle different response formats
-                    libraries = data if isinstance(data, list) else data.get("data", data.get("libraries", []))
-                    
-                    # Extract library paths from Kavita API response
-                    library_list = []
-                    for lib in libraries:
-                        if isinstance(lib, dict):
-                            # Kavita API returns libraries with folders array
-                            # Each library can have multiple folders (rootFolders or folders field)
-                            folders = lib.get("folders") or lib.get("rootFolders") or lib.get("folderPaths") or []
-                            
-                            if isinstance(folders, list):
-                                for folder in folders:
-                                    if isinstance(folder, dict):
-                                        # Folder object with path property
-                                        folder_path = folder.get("path") or folder.get("folder") or folder.get("folderPath")
-                                        if folder_path:
-                                            library_list.append({
-                                                "id": lib.get("id"),
-                                                "name": lib.get("name", "Unknown"),
-                                                "path": folder_path,
-                                                "type": lib.get("type", lib.get("libraryType", "Unknown"))
-                                            })
-                                    elif isinstance(folder, str):
-                                        # Folder is just a path string
-                                        library_list.append({
-                                            "id": lib.get("id"),
-                                            "name": lib.get("name", "Unknown"),
-                                            "path": folder,
-                                            "type": lib.get("type", lib.get("libraryType", "Unknown"))
-                                        })
-                            else:
-                                # Single folder path
-                                folder_path = folders if isinstance(folders, str) else None
-                                if folder_path:
-                                    library_list.append({
-                                        "id": lib.get("id"),
-                                        "name": lib.get("name", "Unknown"),
-                                        "path": folder_path,
-                                        "type": lib.get("type", lib.get("libraryType", "Unknown"))
-                                    })
-                            
-                            # If no folders found but library has a direct path
-                            if not library_list or not any(l.get("id") == lib.get("id") for l in library_list):
-                                direct_path = lib.get("path") or lib.get("folderPath")
-                                if direct_path:
-                                    library_list.append({
-                                        "id": lib.get("id"),
-                                        "name": lib.get("name", "Unknown"),
-                                        "path": direct_path,
-                                        "type": lib.get("type", lib.get("libraryType", "Unknown"))
-                                    })
-                        elif isinstance(lib, str):
-                            # If library is just a path string
-                            library_list.append({
-                                "path": lib,
-                                "name": lib,
-                                "id": None,
-                                "type": "Unknown"
-                            })
-                    
-                    # Cache the results
-                    self._libraries_cache = library_list
-                    self._cache_timestamp = time.time()
-                    
-                    app_logger.info(
-                        f"Fetched {len(library_list)} libraries from Kavita API",
-                        extra={"libraries": library_list}
-                    )
-                    
-                    return library_list
-                elif response.status_code == 401:
-                    app_logger.error(
-                        f"Kavita API authentication failed",
-                        extra={"status": response.status_code, "url": url}
-                    )
-                    raise HTTPException(
-                        status_code=503,
-                        detail="Unable to authenticate with Kavita API. Check your API key or credentials."
-                    )
-                else:
-                    error_text = response.text[:200] if response.text else "No error details"
-                    app_logger.error(
-                        f"Failed to fetch libraries from Kavita API",
-                        extra={"status": response.status_code, "error": error_text, "url": url}
-                    )
-                    raise HTTPException(
-                        status_code=503,
-                        detail=f"Unable to fetch libraries from Kavita API: Status {response.status_code}"
-                    )
+                app_logger.info(
+                    f"Fetched {len(library_list)} libraries from Kavita API",
+                    extra={"count": len(library_list)}
+                )
                 
+                return library_list
+            elif response.status_code == 401:
+                app_logger.error(
+                    f"Kavita API authentication failed",
+                    extra={"status": response.status_code, "url": url}
+                )
+                raise HTTPException(
+                    status_code=503,
+                    detail="Unable to authenticate with Kavita API. Check your API key or credentials."
+                )
+            else:
+                error_text = response.text[:200] if response.text else "No error details"
+                app_logger.error(
+                    f"Failed to fetch libraries from Kavita API",
+                    extra={"status": response.status_code, "error": error_text, "url": url}
+                )
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"Unable to fetch libraries from Kavita API: Status {response.status_code}"
+                )
+            
         except HTTPException:
             raise
         except Exception as e:
@@ -190,28 +299,22 @@ class KavitaAPIClient:
             List of library directory paths
         """
         libraries = await self.get_libraries(force_refresh=force_refresh)
+        
+        # Paths only change when the libraries cache is replaced
+        if self._resolved_paths is not None and self._resolved_paths[0] is libraries:
+            return list(self._resolved_paths[1])
+        
         paths = [lib["path"] for lib in libraries if lib.get("path")]
         
-        # Resolve relative paths if needed
-        resolved_paths = []
-        for path in paths:
-            try:
-                import os
-                resolved = os.path.abspath(os.path.expanduser(path))
-                if os.path.exists(resolved) or os.path.isabs(path):
-                    resolved_paths.append(resolved)
-                else:
-                    app_logger.warning(
-                        f"Library path does not exist, skipping",
-                        extra={"path": path, "resolved": resolved}
-                    )
-            except Exception as e:
-                app_logger.warning(
-                    f"Error resolving library path: {path}",
-                    extra={"error": str(e)}
-                )
+        # Resolve relative paths if needed; existence checks run in worker
+        # threads so slow (network) mounts do not block the event loop
+        results = await asyncio.gather(
+            *(asyncio.to_thread(_resolve_library_path, path) for path in paths)
+        )
+        resolved_paths = [path for path in results if path is not None]
         
-        return resolved_paths
+        self._resolved_paths = (libraries, resolved_paths)
+        return list(resolved_paths)
 
 
 # Global API client instance
@@ -1,14 +1,44 @@
 """Kavita authentication service for user login and session management."""
 
+import json
+import logging
+import time
+from collections import OrderedDict
 import httpx
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from fastapi import HTTPException, Request
 from itsdangerous import TimestampSigner, BadSignature
 
 from app.config import config
+from app.kavita_api import get_http_client
 from app.logger import app_logger
 
+# Optional import for faster token (de)serialization
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def _dumps(data: Dict[str, Any]) -> bytes:
+    """Serialize token data as compact JSON bytes."""
+    if HAS_ORJSON:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(data: bytes) -> Any:
+    """Parse JSON token data (orjson's decode error subclasses json's)."""
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# Verified session tokens kept to skip re-checking the signature of a cookie
+# presented on every request
+VERIFIED_TOKEN_CACHE_SIZE = 4096
+
 
 class KavitaAuthService:
     """Service for authenticating users with Kavita server."""
@@ -16,8 +46,12 @@ class KavitaAuthService:
     def __init__(self):
         self.signer = TimestampSigner(config.auth.session_secret)
         self.kavita_url = config.kavita.server_url.rstrip('/')
-        self.verify_ssl = config.kavita.verify_ssl
-        self.timeout = config.kavita.timeout
+        # Kavita login endpoint (typically /api/Account/login)
+        self._login_url = f"{self.kavita_url}/api/Account/login"
+        # Typically /api/Account/validate-api-key or similar endpoint
+        self._validate_url = f"{self.kavita_url}/api/Account/validate-api-key"
+        # Verified tokens -> (user data, expiry as Unix time), least recently used first
+        self._verified_tokens: OrderedDict[str, Tuple[Dict[str, Any], float]] = OrderedDict()
     
     async def authenticate_with_kavita(
         self,
@@ -46,63 +80,61 @@ class KavitaAuthService:
             )
         
         try:
-            async with httpx.AsyncClient(verify=self.verify_ssl, timeout=self.timeout) as client:
-                # Kavita login endpoint (typically /api/Account/login)
-                login_url = f"{self.kavita_url}/api/Account/login"
+            login_url = self._login_url
+            
+            response = await get_http_client().post(
+                login_url,
+                json={
+                    "username": username,
+                    "password": password
+                }
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
                 
-                response = await client.post(
-                    login_url,
-                    json={
-                        "username": username,
-                        "password": password
-                    }
+                # Extract user information from Kavita response
+                user_info = {
+                    "username": username,
+                    "token": data.get("token"),  # Kavita JWT token
+                    "roles": data.get("roles", []),
+                    "email": data.get("email"),
+                    "id": data.get("id"),
+                }
+                
+                app_logger.info(
+                    f"Kavita authentication successful",
+                    extra={"username": username}
                 )
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    # Extract user information from Kavita response
-                    user_info = {
+                return user_info
+            elif response.status_code == 401:
+                app_logger.warning(
+                    f"Kavita authentication failed - invalid credentials",
+                    extra={"username": username}
+                )
+                raise HTTPException(
+                    status_code=401,
+                    detail="Invalid username or password"
+                )
+            else:
+                app_logger.error(
+                    f"Kavita authentication error: {response.status_code}",
+                    extra={
                         "username": username,
-                        "token": data.get("token"),  # Kavita JWT token
-                        "roles": data.get("roles", []),
-                        "email": data.get("email"),
-                        "id": data.get("id"),
+                        "status_code": response.status_code,
+                        "response": response.text[:200]
                     }
-                    
-                    app_logger.info(
-                        f"Kavita authentication successful",
-                        extra={"username": username}
-                    )
-                    
-                    return user_info
-                elif response.status_code == 401:
-                    app_logger.warning(
-                        f"Kavita authentication failed - invalid credentials",
-                        extra={"username": username}
-                    )
-                    raise HTTPException(
-                        status_code=401,
-                        detail="Invalid username or password"
-                    )
-                else:
-                    app_logger.error(
-                        f"Kavita authentication error: {response.status_code}",
-                        extra={
-                            "username": username,
-                            "status_code": response.status_code,
-                            "response": response.text[:200]
-                        }
-                    )
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Kavita server error: {response.status_code}"
-                    )
-                    
+                )
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Kavita server error: {response.status_code}"
+                )
+                
         except httpx.TimeoutException:
             app_logger.error(
                 f"Kavita authentication timeout",
-                extra={"username": username, "timeout": self.timeout}
+                extra={"username": username, "timeout": config.kavita.timeout}
             )
             raise HTTPException(
                 status_code=504,
@@ -140,37 +172,35 @@ class KavitaAuthService:
             )
         
         try:
-            async with httpx.AsyncClient(verify=self.verify_ssl, timeout=self.timeout) as client:
-                # Validate API key with Kavita server
-                # Typically /api/Account/validate-api-key or similar endpoint
-                validate_url = f"{self.kavita_url}/api/Account/validate-api-key"
+            # Validate API key with Kavita server
+            validate_url = self._validate_url
+            
+            response = await get_http_client().post(
+                validate_url,
+                json={"apiKey": api_key},
+                headers={"Authorization": f"Bearer {api_key}"}
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
                 
-                response = await client.post(
-                    validate_url,
-                    json={"apiKey": api_key},
-                    headers={"Authorization": f"Bearer {api_key}"}
+                user_info = {
+                    "username": data.get("username", "api_user"),
+                    "token": api_key,
+                    "roles": data.get("roles", []),
+                    "email": data.get("email"),
+                    "id": data.get("id"),
+                    "api_key": True
+                }
+                
+                app_logger.info("Kavita API key authentication successful")
+                return user_info
+            else:
+                raise HTTPException(
+                    status_code=401,
+                    detail="Invalid API key"
                 )
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    user_info = {
-                        "username": data.get("username", "api_user"),
-                        "token": api_key,
-                        "roles": data.get("roles", []),
-                        "email": data.get("email"),
-                        "id": data.get("id"),
-                        "api_key": True
-                    }
-                    
-                    app_logger.info("Kavita API key authentication successful")
-                    return user_info
-                else:
-                    raise HTTPException(
-                        status_code=401,
-                        detail="Invalid API key"
-                    )
-                    
         except httpx.RequestError as e:
             app_logger.error(f"Kavita API key validation error: {str(e)}")
             raise HTTPException(
@@ -188,55 +218,68 @@ class KavitaAuthService:
         Returns:
             Signed session token
         """
-        import json
-        
         token_data = {
             "username": username,
             "roles": user_data.get("roles", []),
             "email": user_data.get("email"),
             "user_id": user_data.get("id"),
-            "exp": (datetime.utcnow() + timedelta(hours=config.auth.token_expiry_hours)).isoformat()
+            "exp": time.time() + config.auth.token_expiry_hours * 3600  # Unix timestamp
         }
         
         # Encode as JSON and sign
-        json_data = json.dumps(token_data)
-        token = self.signer.sign(json_data.encode('utf-8'))
+        token = self.signer.sign(_dumps(token_data))
         
         return token.decode('utf-8')
     
     def verify_session_token(self, token: str) -> Optional[Dict[str, Any]]:
         """Verify and decode a session token.
         
+        Tokens that verified before are served from a small LRU cache until
+        they expire, skipping the signature check and JSON decode.
+        
         Args:
             token: Session token to verify
             
         Returns:
             User data dictionary or None if invalid
         """
+        cached = self._verified_tokens.get(token)
+        if cached is not None:
+            user_data, expires_at = cached
+            if time.time() < expires_at:
+                self._verified_tokens.move_to_end(token)
+                return dict(user_data)
+            del self._verified_tokens[token]
+        
         try:
-            import json
+            max_age = config.auth.token_expiry_hours * 3600
             
             # Verify the signature and unsign
-            data = self.signer.unsign(token, max_age=config.auth.token_expiry_hours * 3600)
+            data, signed_at = self.signer.unsign(token, max_age=max_age, return_timestamp=True)
             
             # Parse JSON data
-            user_data = json.loads(data.decode('utf-8'))
+            user_data = _loads(data)
             
-            # Check expiry
-            exp_str = user_data.get("exp")
-            if exp_str:
-                exp = datetime.fromisoformat(exp_str.replace('Z', '+00:00'))
-                if exp < datetime.utcnow():
+            # Check expiry (tokens with the older ISO-string exp are covered
+            # by the signer's max_age)
+            expires_at = signed_at.timestamp() + max_age
+            exp = user_data.get("exp")
+            if isinstance(exp, (int, float)):
+                if exp < time.time():
                     return None
-            
-            return user_data
+                expires_at = min(expires_at, exp)
             
         except (BadSignature, json.JSONDecodeError, ValueError, KeyError) as e:
-            app_logger.debug(f"Token verification failed: {str(e)}")
+            app_logger.debug("Token verification failed: %s", e)
             return None
         except Exception as e:
             app_logger.error(f"Token verification error: {str(e)}")
             return None
+        
+        self._verified_tokens[token] = (user_data, expires_at)
+        if len(self._verified_tokens) > VERIFIED_TOKEN_CACHE_SIZE:
+            self._verified_tokens.popitem(last=False)
+        return dict(user_data)
     
     def get_current_user(self, request: Request) -> Optional[Dict[str, Any]]:
         """Get current authenticated user from request.
@@ -259,28 +302,30 @@ class KavitaAuthService:
             if auth_header and auth_header.startswith("Bearer "):
                 token = auth_header[7:]
         
-        app_logger.debug(
-            f"get_current_user token check",
-            extra={
-                "cookie_name": config.auth.cookie_name,
-                "has_cookie_token": token is not None,
-                "has_auth_header": bool(auth_header),
-                "all_cookies": list(request.cookies.keys()),
-            }
-        )
+        if app_logger.isEnabledFor(logging.DEBUG):
+            app_logger.debug(
+                "get_current_user token check",
+                extra={
+                    "cookie_name": config.auth.cookie_name,
+                    "has_cookie_token": token is not None,
+                    "has_auth_header": bool(auth_header),
+                    "all_cookies": list(request.cookies.keys()),
+                }
+            )
         
         if not token:
             return None
         
         user_data = self.verify_session_token(token)
         
-        app_logger.debug(
-            f"get_current_user token verification",
-            extra={
-                "token_valid": user_data is not None,
-                "username": user_data.get("username") if user_data else None,
-            }
-        )
+        if app_logger.isEnabledFor(logging.DEBUG):
+            app_logger.debug(
+                "get_current_user token verification",
+                extra={
+                    "token_valid": user_data is not None,
+                    "username": user_data.get("username") if user_data else None,
+                }
+            )
         
         return user_data
 
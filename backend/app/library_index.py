@@ -0,0 +1,232 @@
+"""Persistent SHA-256 index of files in the Kavita libraries.
+
+Library duplicate checks look hashes up in the ``library_files`` table instead
+of walking and hashing every library file per upload. ``LibraryIndex.refresh``
+keeps the table in step with the directories and only re-hashes files whose
+size or mtime changed.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import LibraryFile
+from app.logger import app_logger
+
+# Rows per INSERT/DELETE statement, within SQLite's bound-parameter limit
+_WRITE_BATCH_SIZE = 500
+
+# Files hashed at once during a refresh; hashlib releases the GIL while hashing
+_HASH_CONCURRENCY = min(32, (os.cpu_count() or 1) * 2)
+
+
+# Last directory listing per set of search dirs: (monotonic time, listing)
+_scan_cache: Dict[Tuple[str, ...], Tuple[float, Dict[str, Tuple[int, float]]]] = {}
+
+
+def _scan_dirs(search_dirs: List[str]) -> Dict[str, Tuple[int, float]]:
+    """Walk the library directories and return ``path -> (size, mtime)``.
+
+    Uses os.scandir so entry types come from the directory listing itself;
+    only regular files (and symlinks to them) are stat-ed and indexed.
+    """
+    found = {}
+    for search_dir in search_dirs:
+        if not os.path.isdir(search_dir):
+            app_logger.warning(f"Search directory does not exist: {search_dir}")
+            continue
+        pending = [search_dir]
+        while pending:
+            try:
+                entries = os.scandir(pending.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                            continue
+                        # Skip hidden files and anything that is not a file
+                        if entry.name.startswith('.') or not entry.is_file():
+                            continue
+                        stat = entry.stat(follow_symlinks=entry.is_symlink())
+                    except OSError:
+                        continue
+                    found[entry.path] = (stat.st_size, stat.st_mtime)
+    return found
+
+
+def _hash_file(path: str) -> str:
+    """SHA-256 of a file, hashed in C by hashlib.file_digest."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+async def _hash_files(paths: List[str]) -> List[Optional[str]]:
+    """Hash files in worker threads, a bounded number at a time.
+
+    Returns the hashes in the order of ``paths``, with None for files that
+    could not be read.
+    """
+    semaphore = asyncio.Semaphore(_HASH_CONCURRENCY)
+
+    async def hash_one(path: str) -> Optional[str]:
+        async with semaphore:
+            try:
+                return await asyncio.to_thread(_hash_file, path)
+            except OSError as e:
+                app_logger.debug(f"Failed to hash {path}: {e}")
+                return None
+
+    return await asyncio.gather(*(hash_one(path) for path in paths))
+
+
+def _is_under(path: str, search_dirs: List[str]) -> bool:
+    return any(path.startswith(os.path.join(d, "")) for d in search_dirs)
+
+
+def _is_unchanged(path: str, file_size: int, mtime: float) -> bool:
+    """True if the file still exists with the indexed size and mtime."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return (stat.st_size, stat.st_mtime) == (file_size, mtime)
+
+
+class LibraryIndex:
+    """Maintain and query the library file hash index."""
+
+    @staticmethod
+    async def refresh(
+        db_session: AsyncSession,
+        search_dirs: List[str],
+        file_size: Optional[int] = None,
+        scan_max_age: Optional[float] = None
+    ) -> int:
+        """Synchronize the index with the given library directories.
+
+        New or modified files are hashed (in parallel worker threads); rows
+        for files that disappeared are removed. Changes are flushed but not
+        committed; the caller owns the transaction.
+
+        Args:
+            db_session: Database session
+            search_dirs: Library directories to index
+            file_size: Only hash files of this size; others are left for a
+                later full refresh
+            scan_max_age: Reuse a directory listing up to this many seconds
+                old instead of walking the libraries again
+
+        Returns:
+            Number of files hashed
+        """
+        search_dirs = [os.path.abspath(d) for d in search_dirs]
+        key = tuple(search_dirs)
+        cached = _scan_cache.get(key)
+        if (
+            scan_max_age is not None
+            and cached is not None
+            and time.monotonic() - cached[0] < scan_max_age
+        ):
+            on_disk = cached[1]
+        else:
+            on_disk = await asyncio.to_thread(_scan_dirs, search_dirs)
+            _scan_cache[key] = (time.monotonic(), on_disk)
+
+        result = await db_session.execute(
+            select(LibraryFile.path, LibraryFile.file_size, LibraryFile.mtime)
+        )
+        indexed = {
+            row.path: (row.file_size, row.mtime)
+            for row in result
+            if _is_under(row.path, search_dirs)
+        }
+
+        changed = [
+            path for path, stat in on_disk.items()
+            if indexed.get(path) != stat
+            and (file_size is None or stat[0] == file_size)
+        ]
+        hashes = await _hash_files(changed)
+        rows = [
+            {
+                "path": path,
+                "file_size": on_disk[path][0],
+                "mtime": on_disk[path][1],
+                "file_hash_sha256": file_hash,
+            }
+            for path, file_hash in zip(changed, hashes)
+            if file_hash is not None
+        ]
+
+        # Write only after hashing: the first write takes SQLite's write lock,
+        # which the session then holds until the caller commits
+        removed = [path for path in indexed if path not in on_disk]
+        for start in range(0, len(removed), _WRITE_BATCH_SIZE):
+            await db_session.execute(
+                delete(LibraryFile).where(
+                    LibraryFile.path.in_(removed[start:start + _WRITE_BATCH_SIZE])
+                )
+            )
+
+        for start in range(0, len(rows), _WRITE_BATCH_SIZE):
+            stmt = sqlite_insert(LibraryFile)
+            await db_session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[LibraryFile.path],
+                    set_={
+                        "file_size": stmt.excluded.file_size,
+                        "mtime": stmt.excluded.mtime,
+                        "file_hash_sha256": stmt.excluded.file_hash_sha256,
+                    },
+                ),
+                rows[start:start + _WRITE_BATCH_SIZE],
+            )
+
+        # Flush only; committing is left to the caller
+        await db_session.flush()
+
+        app_logger.info(
+            f"Library index refreshed: {len(on_disk)} files, {len(rows)} hashed, {len(removed)} removed",
+            extra={"indexed_files": len(on_disk), "hashed": len(rows), "removed": len(removed)}
+        )
+        return len(rows)
+
+    @staticmethod
+    async def find(
+        db_session: AsyncSession,
+        file_hash: str,
+        search_dirs: List[str]
+    ) -> Optional[str]:
+        """Return the path of an indexed library file with this hash.
+
+        Only files under ``search_dirs`` that still match their indexed size
+        and mtime are returned.
+
+        Args:
+            db_session: Database session
+            file_hash: SHA-256 hash to look up
+            search_dirs: Library directories to consider
+
+        Returns:
+            Path of the matching file, or None
+        """
+        search_dirs = [os.path.abspath(d) for d in search_dirs]
+        result = await db_session.execute(
+            select(LibraryFile.path, LibraryFile.file_size, LibraryFile.mtime)
+            .where(LibraryFile.file_hash_sha256 == file_hash)
+        )
+        for row in result.all():
+            if _is_under(row.path, search_dirs) and await asyncio.to_thread(
+                _is_unchanged, row.path, row.file_size, row.mtime
+            ):
+                return row.path
+        return None
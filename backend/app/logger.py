@@ -1,13 +1,45 @@
 """Structured JSON logging configuration with enhanced scan tracking."""
 
+import atexit
 import json
 import logging
+import queue
 import sys
-from datetime import datetime
+import time
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from typing import Any, Dict
 
+# Optional import for faster JSON serialization
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+# Structured fields copied from ``extra`` into JSON log lines, in output order
+_EXTRA_FIELDS = (
+    # Core file tracking fields
+    "upload_uuid",
+    "uploaded_file",
+    "file_size",
+    "file_hash",
+    "status",
+    "ip_address",
+    # Scanning specific fields
+    "scan_phase",  # "check_hash", "upload", "poll", "complete"
+    "scan_result",
+    "analysis_id",
+    "malicious_count",
+    "total_engines",
+    "virustotal_link",
+    # Performance tracking
+    "duration_ms",
+    "attempt",
+    "max_attempts",
+)
+
 
 class JSONFormatter(logging.Formatter):
     """JSON log formatter for structured logging."""
@@ -22,7 +54,8 @@ class JSONFormatter(logging.Formatter):
             JSON formatted log string
         """
         log_data: Dict[str, Any] = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -30,52 +63,34 @@ class JSONFormatter(logging.Formatter):
             "function": record.funcName,
         }
 
-        # Core file tracking fields
-        if hasattr(record, "upload_uuid"):
-            log_data["upload_uuid"] = record.upload_uuid
-        if hasattr(record, "uploaded_file"):
-            log_data["uploaded_file"] = record.uploaded_file
-        if hasattr(record, "file_size"):
-            log_data["file_size"] = record.file_size
-        if hasattr(record, "file_hash"):
-            log_data["file_hash"] = record.file_hash
-        if hasattr(record, "status"):
-            log_data["status"] = record.status
-        if hasattr(record, "ip_address"):
-            log_data["ip_address"] = record.ip_address
-        
-        # Scanning specific fields
-        if hasattr(record, "scan_phase"):
-            log_data["scan_phase"] = record.scan_phase  # "check_hash", "upload", "poll", "complete"
-        if hasattr(record, "scan_result"):
-            log_data["scan_result"] = record.scan_result
-        if hasattr(record, "analysis_id"):
-            log_data["analysis_id"] = record.analysis_id
-        if hasattr(record, "malicious_count"):
-            log_data["malicious_count"] = record.malicious_count
-        if hasattr(record, "total_engines"):
-            log_data["total_engines"] = record.total_engines
-        if hasattr(record, "virustotal_link"):
-            log_data["virustotal_link"] = record.virustotal_link
-        
-        # Performance tracking
-        if hasattr(record, "duration_ms"):
-            log_data["duration_ms"] = record.duration_ms
-        if hasattr(record, "attempt"):
-            log_data["attempt"] = record.attempt
-        if hasattr(record, "max_attempts"):
-            log_data["max_attempts"] = record.max_attempts
+        # Copy whichever structured fields were passed via ``extra``
+        fields = record.__dict__
+        for field in _EXTRA_FIELDS:
+            if field in fields:
+                log_data[field] = fields[field]
 
         # Add exception info if present
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
 
+        if HAS_ORJSON:
+            return orjson.dumps(log_data).decode()
         return json.dumps(log_data)
 
 
 class TextFormatter(logging.Formatter):
     """Human-readable text formatter for console output."""
     
+    # Color codes for different log levels
+    COLORS = {
+        'DEBUG': '\033[36m',    # Cyan
+        'INFO': '\033[32m',     # Green
+        'WARNING': '\033[33m',  # Yellow
+        'ERROR': '\033[31m',    # Red
+        'CRITICAL': '\033[35m', # Magenta
+    }
+    RESET = '\033[0m'
+    
     def format(self, record: logging.LogRecord) -> str:
         """Format log record as readable text.
         
@@ -85,35 +100,63 @@ class TextFormatter(logging.Formatter):
         Returns:
             Formatted text string
         """
-        # Color codes for different log levels
-        colors = {
-            'DEBUG': '\033[36m',    # Cyan
-            'INFO': '\033[32m',     # Green
-            'WARNING': '\033[33m',  # Yellow
-            'ERROR': '\033[31m',    # Red
-            'CRITICAL': '\033[35m', # Magenta
-        }
-        reset = '\033[0m'
-        
-        color = colors.get(record.levelname, '')
-        timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        color = self.COLORS.get(record.levelname, '')
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(record.created))
         
         # Build base message
-        msg = f"{color}[{record.levelname}]{reset} {timestamp} - {record.getMessage()}"
+        parts = [color, '[', record.levelname, ']', self.RESET, ' ', timestamp, ' - ', record.getMessage()]
         
         # Add context if available
+        fields = record.__dict__
         context_parts = []
-        if hasattr(record, "upload_uuid"):
-            context_parts.append(f"UUID:{record.upload_uuid[:8]}")
-        if hasattr(record, "scan_phase"):
-            context_parts.append(f"Phase:{record.scan_phase}")
-        if hasattr(record, "scan_result"):
-            context_parts.append(f"Result:{record.scan_result}")
+        if "upload_uuid" in fields:
+            context_parts.append(f"UUID:{fields['upload_uuid'][:8]}")
+        if "scan_phase" in fields:
+            context_parts.append(f"Phase:{fields['scan_phase']}")
+        if "scan_result" in fields:
+            context_parts.append(f"Result:{fields['scan_result']}")
         
         if context_parts:
-            msg += f" ({', '.join(context_parts)})"
+            parts += [' (', ', '.join(context_parts), ')']
         
-        return msg
+        return ''.join(parts)
+
+
+class _LocalQueueHandler(QueueHandler):
+    """QueueHandler for an in-process queue.
+
+    The stock ``prepare`` formats the record and drops ``exc_info`` so it can
+    be pickled; here the record stays in-process, so only the message
+    arguments are merged and the listener's formatters see the full record.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+# Queue listeners started by setup_logger, by logger name
+_listeners: Dict[str, QueueListener] = {}
+
+
+def stop_logger(name: str) -> None:
+    """Flush a logger's queue and write to its handlers directly again.
+
+    Args:
+        name: Logger name passed to setup_logger
+    """
+    listener = _listeners.pop(name, None)
+    if listener is None:
+        return
+    listener.stop()
+    logging.getLogger(name).handlers = list(listener.handlers)
+
+
+@atexit.register
+def _stop_all_loggers():
+    for name in list(_listeners):
+        stop_logger(name)
 
 
 def setup_logger(
@@ -142,9 +185,11 @@ def setup_logger(
         Configured logger instance
     """
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)  # Set to DEBUG, handlers will filter
 
     # Remove existing handlers
+    stop_logger(name)
+    for handler in logger.handlers:
+        handler.close()
     logger.handlers = []
 
     # Create log directory if it doesn't exist
@@ -170,8 +215,17 @@ def setup_logger(
     else:
         console_handler.setFormatter(TextFormatter())
 
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    # Records are queued on the calling thread and written by a listener
+    # thread, so logging from request handlers never blocks on disk
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    _listeners[name] = listener
+    logger.addHandler(_LocalQueueHandler(log_queue))
+
+    # Handlers filter per destination; the logger level is the lowest of
+    # them so calls below every handler return before building a record
+    logger.setLevel(min(file_handler.level, console_handler.level))
 
     return logger
 
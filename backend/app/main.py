@@ -1,20 +1,32 @@
 """FastAPI application entry point."""
 
+import asyncio
+import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.exceptions import RequestValidationError
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
 from app.config import config
-from app.database import db
-from app.logger import app_logger, setup_logger
+from app.database import get_db
+from app.logger import app_logger, setup_logger, stop_logger
 from app.routes import router
 
+# Optional import for faster JSON responses
+try:
+    import orjson  # noqa: F401
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Response class for route return values and the error handlers
+DefaultJSONResponse = ORJSONResponse if HAS_ORJSON else JSONResponse
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -26,7 +38,7 @@ async def lifespan(app: FastAPI):
     config.ensure_directories()
     
     # Initialize database
-    await db.init_db()
+    await get_db().init_db()
     app_logger.info("Database initialized")
     
     # Setup logger with config
@@ -39,6 +51,18 @@ async def lifespan(app: FastAPI):
         log_format=config.logging.format,
     )
     
+    background_tasks = []
+    
+    # Keep the library hash index used for duplicate checks current
+    if config.duplicate_detection.enabled and config.duplicate_detection.library_index_refresh_minutes > 0:
+        from app.duplicate_detection import library_index_refresh_task
+        background_tasks.append(asyncio.create_task(library_index_refresh_task()))
+    
+    # Build the OpenAPI schema now; FastAPI caches it on the app, so the
+    # first /docs visit does not walk every route model
+    if app.openapi_url:
+        app.openapi()
+    
     app_logger.info(
         f"Server starting on {config.server.host}:{config.server.port}"
     )
@@ -47,6 +71,17 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     app_logger.info("Shutting down Kavita Uploader...")
+    for task in background_tasks:
+        task.cancel()
+    
+    from app.kavita_api import close_http_client
+    await close_http_client()
+    
+    from app.mover_service import close_manifest
+    close_manifest()
+    
+    # Flush queued log records
+    stop_logger("uploader")
 
 
 # Initialize rate limiter
@@ -61,6 +96,8 @@ app = FastAPI(
     description="Secure e-book upload application for Kavita",
     version="0.1.0",
     lifespan=lifespan,
+    redirect_slashes=False,
+    default_response_class=DefaultJSONResponse,
     docs_url=None if docs_disabled else "/docs",
     redoc_url=None if docs_disabled else "/redoc",
     openapi_url=None if docs_disabled else "/openapi.json",
@@ -80,17 +117,58 @@ app.add_middleware(
 )
 
 
+# Requests not worth a log line each: health/info probes and built frontend assets
+QUIET_PATHS = frozenset({"/health", "/api"})
+QUIET_PATH_PREFIXES = ("/assets/",)
+
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    """Log all requests."""
-    app_logger.info(
-        f"{request.method} {request.url.path}",
-        extra={"ip_address": request.client.host if request.client else "unknown"}
-    )
+    """Log all requests except health probes and static assets."""
+    path = request.scope["path"]
+    if (
+        path not in QUIET_PATHS
+        and not path.startswith(QUIET_PATH_PREFIXES)
+        and app_logger.isEnabledFor(logging.INFO)
+    ):
+        client = request.scope.get("client")
+        app_logger.info(
+            "%s %s", request.method, path,
+            extra={"ip_address": client[0] if client else "unknown"}
+        )
     response = await call_next(request)
     return response
 
 
+# Paths whose trailing slash is dropped before routing. The frontend mount is
+# left alone: StaticFiles needs the slash to serve directory index pages.
+SLASH_NORMALIZED_PREFIXES = ("/api/", "/health/")
+
+
+class TrailingSlashMiddleware:
+    """Route "/api/foo/" as "/api/foo" instead of answering with a redirect.
+
+    Added after ``log_requests`` so it runs first and the request is logged
+    once, under its normalized path.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            path = scope["path"]
+            if path.endswith("/") and path.startswith(SLASH_NORMALIZED_PREFIXES):
+                scope = dict(scope)
+                scope["path"] = path.rstrip("/")
+                if "raw_path" in scope:
+                    scope["raw_path"] = scope["raw_path"].rstrip(b"/")
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(TrailingSlashMiddleware)
+
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Handle request validation errors (422)."""
@@ -102,7 +180,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
             "body": str(exc.body)[:500] if hasattr(exc, 'body') else None,
         }
     )
-    return JSONResponse(
+    return DefaultJSONResponse(
         status_code=422,
         content={
             "error": "Validation error",
@@ -120,7 +198,7 @@ async def global_exception_handler(request: Request, exc: Exception):
         exc_info=True,
         extra={"path": request.url.path}
     )
-    return JSONResponse(
+    return DefaultJSONResponse(
         status_code=500,
         content={
             "error": "Internal server error",
@@ -160,9 +238,10 @@ async def health_check():
 # In development, frontend is served by Vite dev server
 try:
     from pathlib import Path
-    static_path = Path(__file__).parent.parent.parent / "frontend" / "dist"
-    if static_path.exists():
-        app.mount("/", StaticFiles(directory=str(static_path), html=True), name="static")
+    static_path = (Path(__file__).parent.parent.parent / "frontend" / "dist").resolve()
+    if static_path.is_dir():
+        # Already checked above, so StaticFiles can skip its own directory check
+        app.mount("/", StaticFiles(directory=str(static_path), html=True, check_dir=False), name="static")
         app_logger.info(f"Serving frontend from {static_path}")
 except Exception as e:
     app_logger.warning(f"Frontend static files not mounted: {e}")
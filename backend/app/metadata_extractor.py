@@ -1,40 +1,43 @@
 """Metadata extraction service for various e-book formats (Step 3)."""
 
+import asyncio
 import json
 import os
+import re
 import zipfile
 import xml.etree.ElementTree as ET
+from importlib.util import find_spec
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import IO, Dict, Any, Iterable, Optional, List, Tuple
 from datetime import datetime
 
 from app.config import config
 from app.logger import app_logger
 
-# Conditional imports with fallbacks
-try:
-    import fitz  # PyMuPDF
-    HAS_PYMUPDF = True
-except ImportError:
-    HAS_PYMUPDF = False
+# Optional dependencies are probed here but imported on first use, so
+# PyMuPDF's large extension module is only loaded once a PDF is processed
+HAS_PYMUPDF = find_spec("fitz") is not None
+if not HAS_PYMUPDF:
     app_logger.warning("PyMuPDF not installed - PDF metadata extraction limited")
 
-try:
-    import ebooklib
-    from ebooklib import epub
-    HAS_EBOOKLIB = True
-except ImportError:
-    HAS_EBOOKLIB = False
+HAS_EBOOKLIB = find_spec("ebooklib") is not None
+if not HAS_EBOOKLIB:
     app_logger.warning("ebooklib not installed - EPUB metadata extraction unavailable")
 
-try:
-    import rarfile
-    HAS_RARFILE = True
-except ImportError:
-    HAS_RARFILE = False
+HAS_RARFILE = find_spec("rarfile") is not None
+if not HAS_RARFILE:
     app_logger.warning("rarfile not installed - CBR extraction unavailable")
 
 
+# Dublin Core namespace used in EPUB package metadata
+DC_NAMESPACE = '{http://purl.org/dc/elements/1.1/}'
+
+# PDF dates are in format: D:YYYYMMDDHHmmSS (the D: prefix is often omitted)
+_PDF_YEAR_RE = re.compile(r'(?:D:)?(\d{4})')
+# EPUB dates vary: 2019, 2019-03-14, 2019-03-14T00:00:00Z, March 2019
+_EPUB_YEAR_RE = re.compile(r'\d{4}')
+
+
 class MetadataExtractor:
     """Extract metadata from various e-book formats."""
     
@@ -45,6 +48,36 @@ class MetadataExtractor:
         'mobi': ['mobi', 'azw', 'azw3']
     }
     
+    # Extension -> format key of SUPPORTED_FORMATS
+    EXTENSION_FORMATS = {
+        ext: fmt for fmt, extensions in SUPPORTED_FORMATS.items() for ext in extensions
+    }
+    
+    # Archive members counted as comic pages
+    COMIC_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+    
+    # Dublin Core elements read from EPUB package documents
+    EPUB_DC_FIELDS = ('title', 'creator', 'language', 'publisher', 'date', 'subject')
+    
+    # Top-level ComicInfo.xml elements used for metadata
+    COMIC_INFO_FIELDS = ('Title', 'Series', 'Volume', 'Writer', 'Publisher', 'Year', 'PageCount')
+    
+    @staticmethod
+    async def extract_async(file_path: Path, file_extension: str) -> Dict[str, Any]:
+        """Run extract() in a worker thread.
+        
+        Parsing PDFs, EPUBs and comic archives is blocking file I/O and CPU
+        work, so async routes use this to keep the event loop free.
+        
+        Args:
+            file_path: Path to the file
+            file_extension: File extension (without dot)
+            
+        Returns:
+            Dictionary with extracted metadata
+        """
+        return await asyncio.to_thread(MetadataExtractor.extract, file_path, file_extension)
+    
     @staticmethod
     def extract(file_path: Path, file_extension: str) -> Dict[str, Any]:
         """Extract metadata from file based on extension.
@@ -58,23 +91,26 @@ class MetadataExtractor:
         """
         extension = file_extension.lower().lstrip('.')
         
+        # Decide from the extension alone before any file I/O
+        file_format = MetadataExtractor.EXTENSION_FORMATS.get(extension)
+        if file_format is None:
+            app_logger.warning(f"Unsupported format for metadata extraction: {extension}")
+            return MetadataExtractor._default_metadata()
+        
         app_logger.info(
             f"Extracting metadata from {extension.upper()} file",
             extra={"file_path": str(file_path), "extension": extension}
         )
         
         try:
-            if extension == 'pdf':
+            if file_format == 'pdf':
                 return MetadataExtractor._extract_pdf(file_path)
-            elif extension == 'epub':
+            elif file_format == 'epub':
                 return MetadataExtractor._extract_epub(file_path)
-            elif extension in ['cbz', 'cbr']:
+            elif file_format == 'comic':
                 return MetadataExtractor._extract_comic(file_path, extension)
-            elif extension in ['mobi', 'azw', 'azw3']:
-                return MetadataExtractor._extract_mobi(file_path)
             else:
-                app_logger.warning(f"Unsupported format for metadata extraction: {extension}")
-                return MetadataExtractor._default_metadata()
+                return MetadataExtractor._extract_mobi(file_path)
                 
         except Exception as e:
             app_logger.error(
@@ -91,40 +127,36 @@ class MetadataExtractor:
             return MetadataExtractor._default_metadata(error="PyMuPDF not available")
         
         try:
-            doc = fitz.open(file_path)
-            metadata = doc.metadata or {}
+            import fitz  # PyMuPDF
             
-            # Extract standard PDF metadata
-            result = {
-                "title": metadata.get("title", "") or file_path.stem,
-                "author": metadata.get("author", ""),
-                "subject": metadata.get("subject", ""),
-                "keywords": metadata.get("keywords", ""),
-                "creator": metadata.get("creator", ""),
-                "producer": metadata.get("producer", ""),
-                "created_date": metadata.get("creationDate", ""),
-                "modified_date": metadata.get("modDate", ""),
-                "language": "",
-                "publisher": "",
-                "series": "",
-                "volume": "",
-                "year": "",
-                "pages": doc.page_count,
-                "format": "PDF",
-                "extraction_method": "PyMuPDF"
-            }
+            # Close the document (and its file mapping) even if reading fails
+            with fitz.open(file_path, filetype="pdf") as doc:
+                metadata = doc.metadata or {}
+                
+                # Extract standard PDF metadata
+                result = {
+                    "title": metadata.get("title", "") or file_path.stem,
+                    "author": metadata.get("author", ""),
+                    "subject": metadata.get("subject", ""),
+                    "keywords": metadata.get("keywords", ""),
+                    "creator": metadata.get("creator", ""),
+                    "producer": metadata.get("producer", ""),
+                    "created_date": metadata.get("creationDate", ""),
+                    "modified_date": metadata.get("modDate", ""),
+                    "language": "",
+                    "publisher": "",
+                    "series": "",
+                    "volume": "",
+                    "year": "",
+                    "pages": doc.page_count,
+                    "format": "PDF",
+                    "extraction_method": "PyMuPDF"
+                }
             
             # Try to extract year from date
-            if result["created_date"]:
-                try:
-                    # PDF dates are in format: D:YYYYMMDDHHmmSS
-                    date_str = result["created_date"].replace("D:", "")[:4]
-                    if date_str.isdigit():
-                        result["year"] = date_str
-                except:
-                    pass
-            
-            doc.close()
+            match = _PDF_YEAR_RE.match(result["created_date"] or "")
+            if match:
+                result["year"] = match.group(1)
             
             app_logger.info(
                 f"PDF metadata extracted: {result['title']} by {result['author']}",
@@ -139,33 +171,46 @@ class MetadataExtractor:
     
     @staticmethod
     def _extract_epub(file_path: Path) -> Dict[str, Any]:
-        """Extract metadata from EPUB."""
-        if not HAS_EBOOKLIB:
-            return MetadataExtractor._default_metadata(error="ebooklib not available")
+        """Extract metadata from EPUB.
         
+        The package document is read straight from the archive; ebooklib,
+        which parses every content document, is only used as a fallback.
+        """
         try:
-            book = epub.read_epub(file_path)
-            
-            # Extract Dublin Core metadata
-            title = book.get_metadata('DC', 'title')
-            author = book.get_metadata('DC', 'creator')
-            language = book.get_metadata('DC', 'language')
-            publisher = book.get_metadata('DC', 'publisher')
-            date = book.get_metadata('DC', 'date')
-            subject = book.get_metadata('DC', 'subject')
+            package = MetadataExtractor._read_epub_package(file_path)
+            if package is not None:
+                dublin_core, pages = package
+                method = "OPF"
+            elif HAS_EBOOKLIB:
+                import ebooklib
+                from ebooklib import epub
+                
+                book = epub.read_epub(file_path)
+                
+                # Extract Dublin Core metadata
+                dublin_core = {}
+                for name in MetadataExtractor.EPUB_DC_FIELDS:
+                    values = book.get_metadata('DC', name)
+                    if values:
+                        dublin_core[name] = values[0][0]
+                pages = len(list(book.get_items_of_type(ebooklib.ITEM_DOCUMENT)))
+                method = "ebooklib"
+            else:
+                return MetadataExtractor._default_metadata(error="ebooklib not available")
             
+            year_match = _EPUB_YEAR_RE.search(dublin_core.get("date") or "")
             result = {
-                "title": title[0][0] if title else file_path.stem,
-                "author": author[0][0] if author else "",
-                "language": language[0][0] if language else "",
-                "publisher": publisher[0][0] if publisher else "",
-                "subject": subject[0][0] if subject else "",
-                "year": date[0][0][:4] if date and len(date[0][0]) >= 4 else "",
+                "title": dublin_core.get("title", file_path.stem),
+                "author": dublin_core.get("creator", ""),
+                "language": dublin_core.get("language", ""),
+                "publisher": dublin_core.get("publisher", ""),
+                "subject": dublin_core.get("subject", ""),
+                "year": year_match.group(0) if year_match else "",
                 "series": "",
                 "volume": "",
-                "pages": len(list(book.get_items_of_type(ebooklib.ITEM_DOCUMENT))),
+                "pages": pages,
                 "format": "EPUB",
-                "extraction_method": "ebooklib"
+                "extraction_method": method
             }
             
             app_logger.info(
@@ -179,6 +224,98 @@ class MetadataExtractor:
             app_logger.error(f"EPUB metadata extraction error: {str(e)}", exc_info=True)
             return MetadataExtractor._default_metadata(error=str(e))
     
+    @staticmethod
+    def _read_epub_package(file_path: Path) -> Optional[Tuple[Dict[str, str], int]]:
+        """Read Dublin Core metadata and the document count from an EPUB's OPF.
+        
+        Only META-INF/container.xml and the package document are read.
+        
+        Args:
+            file_path: Path to the EPUB
+            
+        Returns:
+            Tuple of (first value per Dublin Core element, number of XHTML
+            documents), or None if the container or package cannot be read
+        """
+        try:
+            with zipfile.ZipFile(file_path, 'r') as z:
+                container = ET.fromstring(z.read('META-INF/container.xml'))
+                rootfile = container.find('.//{urn:oasis:names:tc:opendocument:xmlns:container}rootfile')
+                package = ET.fromstring(z.read(rootfile.get('full-path')))
+        except (KeyError, AttributeError, TypeError, zipfile.BadZipFile, ET.ParseError) as e:
+            app_logger.debug(f"EPUB package not readable directly, falling back: {e}")
+            return None
+        
+        dublin_core = {}
+        metadata = package.find('{*}metadata')
+        if metadata is not None:
+            for elem in metadata:
+                if not isinstance(elem.tag, str) or not elem.tag.startswith(DC_NAMESPACE):
+                    continue
+                name = elem.tag[len(DC_NAMESPACE):]
+                if name in MetadataExtractor.EPUB_DC_FIELDS and name not in dublin_core:
+                    dublin_core[name] = (elem.text or "").strip()
+        
+        pages = sum(
+            1 for item in package.iterfind('{*}manifest/{*}item')
+            if item.get('media-type') == 'application/xhtml+xml'
+        )
+        return dublin_core, pages
+    
+    @staticmethod
+    def _scan_comic_names(names: Iterable[str]) -> Tuple[bool, int]:
+        """Check for ComicInfo.xml and count page images in one pass.
+        
+        Args:
+            names: Member names of the comic archive
+            
+        Returns:
+            Tuple of (has ComicInfo.xml, number of images)
+        """
+        has_info = False
+        image_count = 0
+        for name in names:
+            if name.lower().endswith(MetadataExtractor.COMIC_IMAGE_EXTENSIONS):
+                image_count += 1
+            elif name == 'ComicInfo.xml':
+                has_info = True
+        return has_info, image_count
+    
+    @staticmethod
+    def _read_comic_info(f: IO[bytes]) -> Optional[Dict[str, str]]:
+        """Stream the ComicInfo.xml fields we use from an open archive member.
+        
+        Only top-level elements are read, and parsing stops as soon as every
+        field in COMIC_INFO_FIELDS has been seen, so page lists and other
+        trailing content are never tokenized.
+        
+        Args:
+            f: Binary file object for ComicInfo.xml
+            
+        Returns:
+            Mapping of element name to text, or None if the XML is invalid
+        """
+        wanted = set(MetadataExtractor.COMIC_INFO_FIELDS)
+        fields = {}
+        depth = 0
+        try:
+            for event, elem in ET.iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth == 1 and elem.tag in wanted:
+                    fields[elem.tag] = elem.text or ''
+                    wanted.discard(elem.tag)
+                    if not wanted:
+                        break
+                if depth >= 1:
+                    elem.clear()
+        except ET.ParseError as e:
+            app_logger.warning(f"Failed to parse ComicInfo.xml: {e}")
+            return None
+        return fields
+    
     @staticmethod
     def _extract_comic(file_path: Path, extension: str) -> Dict[str, Any]:
         """Extract metadata from CBZ/CBR using ComicInfo.xml if present."""
@@ -188,17 +325,24 @@ class MetadataExtractor:
             if extension == 'cbz':
                 # CBZ is a ZIP file
                 with zipfile.ZipFile(file_path, 'r') as z:
-                    if 'ComicInfo.xml' in z.namelist():
+                    # infolist() is the parsed central directory itself;
+                    # namelist() would build a second list from it
+                    has_info, image_count = MetadataExtractor._scan_comic_names(
+                        info.filename for info in z.infolist()
+                    )
+                    if has_info:
                         with z.open('ComicInfo.xml') as f:
-                            comic_info = f.read()
-                    image_count = len([n for n in z.namelist() if n.lower().endswith(('.jpg', '.jpeg', '.png', '.webp'))])
+                            comic_info = MetadataExtractor._read_comic_info(f)
             
             elif extension == 'cbr' and HAS_RARFILE:
                 # CBR is a RAR file
+                import rarfile
+                
                 with rarfile.RarFile(file_path, 'r') as r:
-                    if 'ComicInfo.xml' in r.namelist():
-                        comic_info = r.read('ComicInfo.xml')
-                    image_count = len([n for n in r.namelist() if n.lower().endswith(('.jpg', '.jpeg', '.png', '.webp'))])
+                    has_info, image_count = MetadataExtractor._scan_comic_names(r.namelist())
+                    if has_info:
+                        with r.open('ComicInfo.xml') as f:
+                            comic_info = MetadataExtractor._read_comic_info(f)
             else:
                 image_count = 0
             
@@ -215,17 +359,16 @@ class MetadataExtractor:
                 "extraction_method": "archive"
             }
             
-            # Parse ComicInfo.xml if found
-            if comic_info:
+            # Apply ComicInfo.xml fields if found
+            if comic_info is not None:
                 try:
-                    root = ET.fromstring(comic_info)
-                    result["title"] = root.findtext('Title', result["title"])
-                    result["series"] = root.findtext('Series', '')
-                    result["volume"] = root.findtext('Volume', '')
-                    result["author"] = root.findtext('Writer', '')
-                    result["publisher"] = root.findtext('Publisher', '')
-                    result["year"] = root.findtext('Year', '')
-                    result["pages"] = int(root.findtext('PageCount', image_count))
+                    result["title"] = comic_info.get('Title', result["title"])
+                    result["series"] = comic_info.get('Series', '')
+                    result["volume"] = comic_info.get('Volume', '')
+                    result["author"] = comic_info.get('Writer', '')
+                    result["publisher"] = comic_info.get('Publisher', '')
+                    result["year"] = comic_info.get('Year', '')
+                    result["pages"] = int(comic_info.get('PageCount', image_count))
                     result["extraction_method"] = "ComicInfo.xml"
                 except Exception as e:
                     app_logger.warning(f"Failed to parse ComicInfo.xml: {e}")
@@ -1,5 +1,6 @@
 """File moving service with duplicate detection and integrity verification (Step 4)."""
 
+import asyncio
 import hashlib
 import os
 import csv
@@ -7,14 +8,145 @@ import json
 import shutil
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import config
 from app.database import Upload
+from app.library_index import LibraryIndex
 from app.logger import app_logger
 
+# Read size for copies that hash the data on the way through
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Characters removed from generated filenames
+_INVALID_FILENAME_CHARS = str.maketrans('', '', '<>:"/\\|?*')
+
+# Seconds a library directory listing is reused by duplicate checks on moves
+LIBRARY_SCAN_MAX_AGE = 60
+
+# Kernel-side file copies (Linux)
+HAS_COPY_FILE_RANGE = hasattr(os, "copy_file_range")
+
+
+def _hash_file(file_path: Path) -> str:
+    """SHA-256 of a file, hashed in C by hashlib.file_digest."""
+    with open(file_path, 'rb') as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _copy_and_hash(source: Path, destination: Path) -> str:
+    """Copy a file with its metadata and return the SHA-256 of the copied bytes.
+    
+    The hash is computed from the same reads that feed the copy, so the
+    data is only read from disk once.
+    """
+    sha256 = hashlib.sha256()
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        while chunk := src.read(COPY_CHUNK_SIZE):
+            sha256.update(chunk)
+            dst.write(chunk)
+    shutil.copystat(source, destination)
+    return sha256.hexdigest()
+
+
+def _copy_file(source: Path, destination: Path) -> None:
+    """Copy a file with its metadata without passing the bytes through Python.
+    
+    copy_file_range lets the kernel (or a reflink-capable filesystem) do the
+    copy; where it is unsupported, shutil.copyfile falls back to sendfile.
+    """
+    copied = False
+    if HAS_COPY_FILE_RANGE:
+        try:
+            with open(source, 'rb') as src, open(destination, 'wb') as dst:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    written = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if written == 0:
+                        break
+                    remaining -= written
+            copied = True
+        except OSError:
+            # e.g. EXDEV across filesystems on older kernels, or ENOSYS
+            pass
+    if not copied:
+        shutil.copyfile(source, destination)
+    shutil.copystat(source, destination)
+
+
+def _destination_candidates(dest_dir: Path, filename: str) -> Iterator[Path]:
+    """Yield ``filename`` in ``dest_dir``, then ``stem_1.ext``, ``stem_2.ext``..."""
+    path = dest_dir / filename
+    yield path
+    counter = 1
+    while True:
+        yield dest_dir / f"{path.stem}_{counter}{path.suffix}"
+        counter += 1
+
+
+def _reserve_destination(dest_dir: Path, filename: str) -> Path:
+    """Claim the first free destination name by creating an empty placeholder.
+    
+    O_CREAT | O_EXCL makes the check and the claim one atomic step, so two
+    concurrent moves can never pick the same name.
+    """
+    for path in _destination_candidates(dest_dir, filename):
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            continue
+        os.close(fd)
+        return path
+
+
+class _ManifestWriter:
+    """Appends rows to the checksum manifest, keeping the file open between rows."""
+    
+    FIELDNAMES = [
+        'timestamp', 'uuid', 'original_filename', 'destination_path',
+        'file_hash', 'file_size', 'action', 'reason'
+    ]
+    
+    def __init__(self):
+        self._path: Optional[Path] = None
+        self._file = None
+        self._writer: Optional[csv.DictWriter] = None
+    
+    def write(self, path: Path, row: Dict) -> None:
+        """Append a row to the manifest at ``path``, (re)opening it if needed."""
+        if path != self._path:
+            self.close()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(path, 'a', newline='')
+            self._writer = csv.DictWriter(self._file, fieldnames=self.FIELDNAMES)
+            # Append mode starts at the end, so position 0 means a new file
+            if self._file.tell() == 0:
+                self._writer.writeheader()
+            self._path = path
+        
+        self._writer.writerow(row)
+        # One write per row keeps the manifest complete if the process dies
+        self._file.flush()
+    
+    def close(self) -> None:
+        """Close the open manifest file, if any."""
+        if self._file is not None:
+            self._file.close()
+        self._path = None
+        self._file = None
+        self._writer = None
+
+
+_manifest_writer = _ManifestWriter()
+
+
+def close_manifest() -> None:
+    """Close the checksum manifest file (called on application shutdown)."""
+    _manifest_writer.close()
+
 
 class MoverService:
     """Service for moving files from quarantine to unsorted library with duplicate detection."""
@@ -29,13 +161,9 @@ class MoverService:
         Returns:
             Hexadecimal hash string
         """
-        sha256 = hashlib.sha256()
-        
-        with open(file_path, 'rb') as f:
-            while chunk := f.read(8192):
-                sha256.update(chunk)
-        
-        return sha256.hexdigest()
+        # file_digest runs the read/update loop in C without the GIL;
+        # the worker thread keeps large files off the event loop
+        return await asyncio.to_thread(_hash_file, file_path)
     
     @staticmethod
     async def check_duplicates_by_hash(
@@ -69,39 +197,56 @@ class MoverService:
     @staticmethod
     async def check_duplicates_in_filesystem(
         file_hash: str,
-        search_dirs: List[str]
+        file_size: int,
+        search_dirs: List[str],
+        db_session: AsyncSession
     ) -> Tuple[bool, Optional[str]]:
         """Check if a file with this hash exists in filesystem directories.
         
+        The hash is looked up in the library file index. On a miss the index
+        is refreshed for ``search_dirs`` and the lookup is repeated, so files
+        added since the last refresh are still found. Only new or modified
+        files of ``file_size`` bytes are hashed, as no other file can match,
+        and a directory listing up to LIBRARY_SCAN_MAX_AGE seconds old is
+        reused rather than walking the libraries for every move. The refresh
+        is committed in its own session; ``db_session`` is neither flushed
+        nor committed. If the database is locked, the check reports no
+        duplicate rather than failing the move.
+        
         Args:
             file_hash: SHA-256 hash to check
+            file_size: Size of the file in bytes
             search_dirs: List of directories to search
+            db_session: Database session
             
         Returns:
             Tuple of (is_duplicate, file_path)
         """
-        for search_dir in search_dirs:
-            if not os.path.exists(search_dir):
-                app_logger.warning(f"Search directory does not exist: {search_dir}")
-                continue
-            
-            for root, _, files in os.walk(search_dir):
-                for file in files:
-                    file_path = Path(root) / file
-                    
-                    # Skip hidden files and non-ebook files
-                    if file.startswith('.'):
-                        continue
-                    
-                    try:
-                        existing_hash = await MoverService.compute_file_hash(file_path)
-                        if existing_hash == file_hash:
-                            return (True, str(file_path))
-                    except Exception as e:
-                        app_logger.debug(f"Failed to hash {file_path}: {e}")
-                        continue
-        
-        return (False, None)
+        # Don't autoflush the caller's pending changes: that would take the
+        # SQLite write lock the refresh session below needs
+        with db_session.no_autoflush:
+            file_path = await LibraryIndex.find(db_session, file_hash, search_dirs)
+        if file_path is None:
+            # Refresh in a session of its own, so the index rows are committed
+            # without committing (or write-locking) the caller's move session
+            try:
+                async with AsyncSession(db_session.bind, expire_on_commit=False) as index_session:
+                    await LibraryIndex.refresh(
+                        index_session,
+                        search_dirs,
+                        file_size=file_size,
+                        scan_max_age=LIBRARY_SCAN_MAX_AGE
+                    )
+                    await index_session.commit()
+                    file_path = await LibraryIndex.find(index_session, file_hash, search_dirs)
+            except OperationalError as e:
+                # e.g. "database is locked" while another refresh is writing
+                app_logger.warning(
+                    "Library index refresh failed - treating as no filesystem duplicate",
+                    extra={"error": str(e)}
+                )
+        
+        return (file_path is not None, file_path)
     
     @staticmethod
     async def check_name_conflict(
@@ -125,28 +270,21 @@ class MoverService:
         if not title or not author:
             return (False, None)
         
-        # Search for files with same metadata
+        # Indexed lookup on the normalized columns kept in step with
+        # metadata_json (see Upload.title_lc / author_lc)
         query = select(Upload).where(
+            Upload.title_lc == title.lower(),
+            Upload.author_lc == author.lower(),
             Upload.status.in_(["moved", "safe", "metadata_verified"]),
-            Upload.metadata_json.isnot(None)
         )
         
         if exclude_uuid:
             query = query.where(Upload.uuid != exclude_uuid)
         
-        result = await db_session.execute(query)
-        uploads = result.scalars().all()
+        result = await db_session.execute(query.limit(1))
+        conflict = result.scalar_one_or_none()
         
-        for upload in uploads:
-            try:
-                upload_metadata = json.loads(upload.metadata_json)
-                if (upload_metadata.get("title", "").strip().lower() == title.lower() and
-                    upload_metadata.get("author", "").strip().lower() == author.lower()):
-                    return (True, upload)
-            except json.JSONDecodeError:
-                continue
-        
-        return (False, None)
+        return (conflict is not None, conflict)
     
     @staticmethod
     def generate_renamed_filename(
@@ -174,10 +312,7 @@ class MoverService:
         # Sanitize title and author for filename
         def sanitize(s: str) -> str:
             # Remove invalid filename characters
-            invalid_chars = '<>:"/\\|?*'
-            for char in invalid_chars:
-                s = s.replace(char, '')
-            return s.strip()[:100]  # Limit length
+            return s.translate(_INVALID_FILENAME_CHARS).strip()[:100]  # Limit length
         
         title = sanitize(title)
         author = sanitize(author)
@@ -230,32 +365,16 @@ class MoverService:
         if not config.moving.checksum_manifest:
             return
         
-        manifest_path = Path(config.moving.manifest_path)
-        manifest_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Check if file exists to determine if we need headers
-        file_exists = manifest_path.exists()
-        
-        with open(manifest_path, 'a', newline='') as csvfile:
-            fieldnames = [
-                'timestamp', 'uuid', 'original_filename', 'destination_path',
-                'file_hash', 'file_size', 'action', 'reason'
-            ]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            if not file_exists:
-                writer.writeheader()
-            
-            writer.writerow({
-                'timestamp': datetime.utcnow().isoformat(),
-                'uuid': upload.uuid,
-                'original_filename': upload.original_filename,
-                'destination_path': destination_path or 'N/A',
-                'file_hash': upload.file_hash_sha256,
-                'file_size': upload.file_size,
-                'action': action,
-                'reason': reason or ''
-            })
+        _manifest_writer.write(Path(config.moving.manifest_path), {
+            'timestamp': datetime.utcnow().isoformat(),
+            'uuid': upload.uuid,
+            'original_filename': upload.original_filename,
+            'destination_path': destination_path or 'N/A',
+            'file_hash': upload.file_hash_sha256,
+            'file_size': upload.file_size,
+            'action': action,
+            'reason': reason or ''
+        })
     
     @staticmethod
     async def move_file(
@@ -390,7 +509,9 @@ class MoverService:
             search_dirs.extend(config.moving.kavita_library_dirs)
         is_fs_duplicate, fs_duplicate_path = await MoverService.check_duplicates_in_filesystem(
             file_hash,
-            search_dirs
+            upload.file_size,
+            search_dirs,
+            db_session
         )
         
         if is_fs_duplicate and config.moving.discard_on_exact_duplicate:
@@ -484,17 +605,14 @@ class MoverService:
         except Exception as e:
             app_logger.warning(f"Failed to set directory permissions: {e}")
         
-        destination_path = dest_dir / filename
-        
-        # Ensure destination doesn't exist
-        counter = 1
-        base_name = destination_path.stem
-        while destination_path.exists():
-            destination_path = dest_dir / f"{base_name}_{counter}{destination_path.suffix}"
-            counter += 1
-        
         # DRY RUN MODE
         if config.moving.dry_run:
+            # Report the name a real move would get, without claiming it
+            destination_path = next(
+                path for path in _destination_candidates(dest_dir, filename)
+                if not path.exists()
+            )
+            
             app_logger.info(
                 "DRY RUN: Would move file",
                 extra={
@@ -515,24 +633,27 @@ class MoverService:
             }
         
         # STEP 5: Move the file
+        destination_path = None
         try:
+            # Claim a free name atomically; the move below overwrites the placeholder
+            destination_path = await asyncio.to_thread(_reserve_destination, dest_dir, filename)
+            
             if config.moving.atomic_operations and source_path.parent == destination_path.parent:
                 # Atomic move (same filesystem)
                 os.replace(source_path, destination_path)
                 app_logger.info("File moved atomically (os.replace)")
             else:
                 # Copy + verify + delete (different filesystem or atomic disabled)
-                shutil.copy2(source_path, destination_path)
-                app_logger.info("File copied to destination")
-                
-                # Verify integrity if configured
                 if config.moving.verify_integrity_post_move:
-                    is_valid, actual_hash = await MoverService.verify_integrity(
-                        destination_path,
-                        file_hash
+                    # Hash while copying rather than re-reading the copy
+                    actual_hash = await asyncio.to_thread(
+                        _copy_and_hash,
+                        source_path,
+                        destination_path
                     )
+                    app_logger.info("File copied to destination")
                     
-                    if not is_valid:
+                    if actual_hash != file_hash:
                         # Integrity check failed - rollback
                         app_logger.error(
                             "Integrity check failed after move - rolling back",
@@ -559,6 +680,9 @@ class MoverService:
                         }
                     
                     app_logger.info("Integrity verified successfully")
+                else:
+                    await asyncio.to_thread(_copy_file, source_path, destination_path)
+                    app_logger.info("File copied to destination")
                 
                 # Delete quarantine file only after successful verification
                 if config.moving.cleanup_quarantine_on_success:
@@ -578,6 +702,10 @@ class MoverService:
                 extra={"upload_uuid": upload_uuid}
             )
             
+            # Drop the placeholder or partial copy; the quarantine file is kept
+            if destination_path is not None and source_path.exists():
+                destination_path.unlink(missing_ok=True)
+            
             upload.status = "move_failed"
             upload.error_message = str(e)
             await db_session.commit()
@@ -1,5 +1,7 @@
 """API routes for upload and processing."""
 
+import logging
+import os
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from fastapi import (
@@ -15,7 +17,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.config import config
-from app.database import db, Upload
+from app.database import get_db, Upload
 from app.services import (
     UploadService,
     ScanningService,
@@ -62,26 +64,29 @@ async def get_current_user(request: Request) -> Optional[Dict[str, Any]]:
     if not config.kavita.enabled:
         return None
     
-    # Debug logging
-    app_logger.debug(
-        f"get_current_user called",
-        extra={
-            "kavita_enabled": config.kavita.enabled,
-            "cookie_name": config.auth.cookie_name,
-            "cookies_received": list(request.cookies.keys()),
-            "has_auth_cookie": config.auth.cookie_name in request.cookies,
-        }
-    )
+    # Debug logging; guarded because the extras are built on every request
+    debug = app_logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        app_logger.debug(
+            "get_current_user called",
+            extra={
+                "kavita_enabled": config.kavita.enabled,
+                "cookie_name": config.auth.cookie_name,
+                "cookies_received": list(request.cookies.keys()),
+                "has_auth_cookie": config.auth.cookie_name in request.cookies,
+            }
+        )
     
     user = kavita_auth.get_current_user(request)
     
-    app_logger.debug(
-        f"get_current_user result",
-        extra={
-            "user_found": user is not None,
-            "username": user.get("username") if user else None,
-        }
-    )
+    if debug:
+        app_logger.debug(
+            "get_current_user result",
+            extra={
+                "user_found": user is not None,
+                "username": user.get("username") if user else None,
+            }
+        )
     
     return user
 
@@ -112,7 +117,7 @@ async def require_auth(request: Request) -> Dict[str, Any]:
 
 async def get_db_session():
     """Dependency for database session."""
-    async for session in db.get_session():
+    async for session in get_db().get_session():
         yield session
 
 
@@ -323,7 +328,7 @@ async def upload_file(
     """
     try:
         # Validate file extension
-        if not validate_file_extension(file.filename, config.upload.allowed_extensions):
+        if not validate_file_extension(file.filename, config.upload.allowed_extensions_set):
             app_logger.warning(
                 f"Rejected file with invalid extension",
                 extra={
@@ -340,9 +345,12 @@ async def upload_file(
                 }
             )
         
-        # Read file content
-        file_content = await file.read()
-        file_size = len(file_content)
+        # The multipart parser has already spooled the body to a temporary
+        # file; measure it instead of reading it all into memory
+        file_size = file.size
+        if file_size is None:
+            file.file.seek(0, os.SEEK_END)
+            file_size = file.file.tell()
         
         # Validate file size
         if file_size > config.max_file_size_bytes:
@@ -382,7 +390,7 @@ async def upload_file(
             
             # Check 1: Disk space availability
             quarantine_path = Path(config.quarantine_dir)
-            space_ok, space_reason = DiskMonitor.check_disk_space_available(
+            space_ok, space_reason = await DiskMonitor.check_disk_space_available(
                 quarantine_path,
                 file_size
             )
@@ -501,11 +509,13 @@ async def upload_file(
         
         # Save to quarantine
         upload = await UploadService.save_to_quarantine(
-            file_content=file_content,
+            file_obj=file.file,
             original_filename=file.filename,
             db_session=db_session,
             uploaded_by=username,
         )
+        if config.disk_protection.enabled:
+            DiskMonitor.invalidate_quarantine_cache()
         
         app_logger.info(
             f"File uploaded successfully",
@@ -535,13 +545,12 @@ async def upload_file(
             
             # Import here to avoid circular imports
             import asyncio
-            from app.database import db as database
             
             # Trigger scan asynchronously with its own DB session (don't block upload response)
             async def trigger_scan():
                 """Background task with its own DB session."""
                 try:
-                    async for scan_session in database.get_session():
+                    async for scan_session in get_db().get_session():
                         await ScanningService.scan_file_with_logging(
                             upload.uuid,
                             scan_session,
@@ -786,14 +795,14 @@ async def get_metadata(
         
         # Extract metadata
         file_path = Path(upload.quarantine_path)
-        metadata = MetadataExtractor.extract(file_path, upload.file_extension)
+        metadata = await MetadataExtractor.extract_async(file_path, upload.file_extension)
         
         # Add original filename if title is empty
         if not metadata.get("title"):
             metadata["title"] = upload.original_filename
         
         # Save to database
-        upload.metadata_json = json.dumps(metadata)
+        upload.metadata_json = json.dumps(metadata, separators=(",", ":"))
         upload.metadata_extracted_at = datetime.utcnow()
         await db_session.commit()
         
@@ -879,7 +888,7 @@ async def update_metadata(
                 metadata[key] = metadata[key].strip()
         
         # Update metadata
-        upload.metadata_json = json.dumps(metadata)
+        upload.metadata_json = json.dumps(metadata, separators=(",", ":"))
         upload.metadata_edited = True
         upload.metadata_verified_at = datetime.utcnow()
         upload.status = "metadata_verified"
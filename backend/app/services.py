@@ -1,9 +1,11 @@
 """Business logic services for upload processing pipeline."""
 
+import asyncio
+import hashlib
 import os
 import shutil
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import BinaryIO, Optional, Dict, Any
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
@@ -15,19 +17,33 @@ from app.utils import (
     generate_uuid_filename,
     set_secure_file_permissions,
     get_file_size,
-    calculate_file_hash,
     detect_mime_type,
     get_file_extension,
 )
 from app.logger import app_logger
 
 
+# Bytes per read when copying an upload into quarantine
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def _write_and_hash(source: BinaryIO, destination: Path) -> str:
+    """Copy a file object to ``destination`` and return its SHA-256."""
+    sha256_hash = hashlib.sha256()
+    source.seek(0)
+    with open(destination, "wb") as f:
+        for chunk in iter(lambda: source.read(COPY_CHUNK_SIZE), b""):
+            sha256_hash.update(chunk)
+            f.write(chunk)
+    return sha256_hash.hexdigest()
+
+
 class UploadService:
     """Service for handling file uploads and quarantine (Step 1)."""
 
     @staticmethod
     async def save_to_quarantine(
-        file_content: bytes,
+        file_obj: BinaryIO,
         original_filename: str,
         db_session: AsyncSession,
         uploaded_by: Optional[str] = None,
@@ -37,7 +53,8 @@ class UploadService:
         This implements Step 1: Upload + Quarantine functionality.
         
         Args:
-            file_content: File content bytes
+            file_obj: Binary file object with the uploaded content (read
+                from the start in chunks, never loaded whole into memory)
             original_filename: Original filename from upload
             db_session: Database session
             
@@ -61,8 +78,8 @@ class UploadService:
         
         # Write file with secure permissions
         try:
-            with open(quarantine_path, "wb") as f:
-                f.write(file_content)
+            # Copy in chunks, hashing on the way, in a worker thread
+            file_hash = await asyncio.to_thread(_write_and_hash, file_obj, quarantine_path)
             
             # Set restrictive permissions (owner read/write only)
             set_secure_file_permissions(
@@ -73,7 +90,6 @@ class UploadService:
             # Get file info
             file_size = get_file_size(str(quarantine_path))
             mime_type = detect_mime_type(str(quarantine_path))
-            file_hash = await calculate_file_hash(str(quarantine_path))
             
             # Create database record
             upload = Upload(
@@ -369,7 +385,7 @@ class ScanningService:
             upload.status = "scan_error"
         
         # Update database
-        upload.scan_details = json.dumps(scan_results)
+        upload.scan_details = json.dumps(scan_results, separators=(",", ":"))
         upload.scanned_at = datetime.utcnow()
         
         await db_session.commit()
@@ -6,7 +6,7 @@ import hashlib
 import uuid
 import magic
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import Collection, Tuple, Optional
 from datetime import datetime
 
 
@@ -59,18 +59,18 @@ def get_file_extension(filename: str) -> str:
     return ext
 
 
-def validate_file_extension(filename: str, allowed_extensions: list) -> bool:
+def validate_file_extension(filename: str, allowed_extensions: Collection[str]) -> bool:
     """Check if file extension is allowed.
     
     Args:
         filename: Filename to validate
-        allowed_extensions: List of allowed extensions (without dots)
+        allowed_extensions: Lower-cased allowed extensions without dots
+            (see UploadConfig.allowed_extensions_set)
         
     Returns:
         True if extension is allowed, False otherwise
     """
-    ext = get_file_extension(filename)
-    return ext in [e.lower() for e in allowed_extensions]
+    return get_file_extension(filename) in allowed_extensions
 
 
 def detect_mime_type(file_path: str) -> Optional[str]:
@@ -89,12 +89,12 @@ def detect_mime_type(file_path: str) -> Optional[str]:
         return None
 
 
-def validate_mime_type(mime_type: Optional[str], allowed_mime_types: list) -> bool:
+def validate_mime_type(mime_type: Optional[str], allowed_mime_types: Collection[str]) -> bool:
     """Check if MIME type is allowed.
     
     Args:
         mime_type: MIME type to validate
-        allowed_mime_types: List of allowed MIME types
+        allowed_mime_types: Allowed MIME types
         
     Returns:
         True if MIME type is allowed, False otherwise
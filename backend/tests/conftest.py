@@ -0,0 +1,43 @@
+"""Shared test fixtures."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import Database, Upload
+
+
+@pytest.fixture
+async def db_session(tmp_path):
+    """Session on a fresh file-backed database."""
+    database = Database(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    await database.init_db()
+    async with database.async_session_maker() as session:
+        yield session
+    await database.engine.dispose()
+
+
+@pytest.fixture
+def add_upload(db_session):
+    """Factory that commits an Upload row and returns it.
+
+    ``name`` is used for the uuid and filenames; ``age_hours`` backdates
+    ``uploaded_at``. Any other keyword overrides the matching column.
+    """
+    async def add(name, age_hours=1, **columns):
+        values = {
+            "uuid": name,
+            "original_filename": name,
+            "sanitized_filename": name,
+            "file_size": 0,
+            "file_extension": ".epub",
+            "quarantine_path": f"/tmp/{name}",
+            "uploaded_at": datetime.utcnow() - timedelta(hours=age_hours),
+        }
+        values.update(columns)
+        upload = Upload(**values)
+        db_session.add(upload)
+        await db_session.commit()
+        return upload
+
+    return add
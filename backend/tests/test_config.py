@@ -0,0 +1,91 @@
+"""Tests for configuration loading."""
+
+import os
+
+from app.config import Config, _load_yaml_cached
+
+
+def write_config(path, body: str):
+    path.write_text(body)
+    return str(path)
+
+
+def test_yaml_values_applied(tmp_path):
+    """Values from config.yaml override the section defaults."""
+    config_path = write_config(tmp_path / "config.yaml", "server:\n  port: 6060\n")
+
+    cfg = Config(config_path)
+
+    assert cfg.server.port == 6060
+    assert cfg.upload.max_file_size_mb == 25
+
+
+def test_missing_file_uses_defaults(tmp_path):
+    """A missing config file falls back to defaults."""
+    cfg = Config(str(tmp_path / "does-not-exist.yaml"))
+
+    assert cfg.server.port == 5050
+
+
+def test_unchanged_file_is_parsed_once(tmp_path):
+    """Re-creating Config for an unchanged file reuses the cached parse."""
+    config_path = write_config(tmp_path / "config.yaml", "server:\n  port: 6060\n")
+    Config.invalidate_cache()
+
+    Config(config_path).server
+    Config(config_path).server
+
+    info = _load_yaml_cached.cache_info()
+    assert info.misses == 1
+    assert info.hits == 1
+
+
+def test_modified_file_is_reparsed(tmp_path):
+    """Editing the file changes the cache key, so new values are picked up."""
+    config_path = write_config(tmp_path / "config.yaml", "server:\n  port: 6060\n")
+    assert Config(config_path).server.port == 6060
+
+    write_config(tmp_path / "config.yaml", "server:\n  port: 7070\n")
+    st = os.stat(config_path)
+    os.utime(config_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    assert Config(config_path).server.port == 7070
+
+
+def test_sections_built_lazily(tmp_path):
+    """Sections are only constructed when first accessed, then reused."""
+    cfg = Config(str(tmp_path / "config.yaml"))
+
+    assert "server" not in cfg.__dict__
+    server = cfg.server
+    assert cfg.__dict__["server"] is server
+    assert cfg.server is server
+
+
+def test_allowed_extension_set_is_normalized(tmp_path):
+    """The extension set is lower-cased for direct membership checks."""
+    config_path = write_config(
+        tmp_path / "config.yaml", "upload:\n  allowed_extensions: [EPUB, pdf]\n"
+    )
+
+    cfg = Config(config_path)
+
+    assert cfg.upload.allowed_extensions_set == frozenset({"epub", "pdf"})
+
+
+def test_ensure_directories_only_chmods_new_directories(tmp_path):
+    """Existing directories keep their mode; new ones get the secure mode."""
+    existing = tmp_path / "quarantine"
+    existing.mkdir(mode=0o755)
+    existing.chmod(0o755)
+    config_path = write_config(
+        tmp_path / "config.yaml",
+        f"folders:\n  quarantine: {existing}\n  unsorted: {tmp_path / 'new' / 'unsorted'}\n"
+        f"logging:\n  file: {tmp_path / 'logs' / 'app.log'}\n",
+    )
+
+    Config(config_path).ensure_directories()
+
+    assert existing.stat().st_mode & 0o777 == 0o755
+    assert (tmp_path / "new" / "unsorted").stat().st_mode & 0o777 == 0o700
+    assert (tmp_path / "logs").is_dir()
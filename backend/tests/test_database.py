@@ -0,0 +1,162 @@
+"""Tests for database initialization and schema migration."""
+
+import pytest
+from sqlalchemy import text
+
+from app.database import Database
+
+
+@pytest.fixture
+async def legacy_db(tmp_path):
+    """Database whose uploads table predates the Step 3/4 columns."""
+    database = Database(f"sqlite+aiosqlite:///{tmp_path / 'legacy.db'}")
+    async with database.engine.begin() as conn:
+        await conn.execute(text(
+            "CREATE TABLE uploads ("
+            "id INTEGER PRIMARY KEY, uuid VARCHAR(36) NOT NULL UNIQUE, "
+            "original_filename VARCHAR(255) NOT NULL, sanitized_filename VARCHAR(255) NOT NULL, "
+            "file_size BIGINT NOT NULL, mime_type VARCHAR(100), file_extension VARCHAR(10) NOT NULL, "
+            "status VARCHAR(50) NOT NULL, quarantine_path VARCHAR(500) NOT NULL, "
+            "final_path VARCHAR(500), file_hash_sha256 VARCHAR(64), "
+            "uploaded_at DATETIME NOT NULL, scanned_at DATETIME, moved_at DATETIME, "
+            "scan_result VARCHAR(50), scan_details TEXT, is_duplicate BOOLEAN, "
+            "duplicate_of VARCHAR(36), error_message TEXT)"
+        ))
+    yield database
+    await database.engine.dispose()
+
+
+async def upload_columns(database):
+    async with database.engine.connect() as conn:
+        result = await conn.execute(text("PRAGMA table_info(uploads)"))
+        return {row[1] for row in result.fetchall()}
+
+
+async def test_init_db_adds_missing_columns(legacy_db):
+    """init_db adds the columns introduced after the table was created."""
+    await legacy_db.init_db()
+
+    columns = await upload_columns(legacy_db)
+    assert {"metadata_json", "duplicate_reason", "uploaded_by"} <= columns
+
+
+async def test_init_db_is_idempotent(legacy_db):
+    """Running init_db twice leaves the schema unchanged."""
+    await legacy_db.init_db()
+    first = await upload_columns(legacy_db)
+
+    await legacy_db.init_db()
+
+    assert await upload_columns(legacy_db) == first
+
+
+async def test_init_db_adds_missing_indexes(legacy_db):
+    """Indexes declared on the model are created on pre-existing tables."""
+    await legacy_db.init_db()
+
+    async with legacy_db.engine.connect() as conn:
+        result = await conn.execute(text("PRAGMA index_list(uploads)"))
+        indexes = {row[1] for row in result.fetchall()}
+
+    assert {
+        "ix_uploads_status_uploaded_at", "ix_uploads_hash_size", "ix_uploads_status_size",
+    } <= indexes
+
+
+async def test_init_db_drops_superseded_indexes(legacy_db):
+    """Single-column indexes covered by a composite index are removed."""
+    async with legacy_db.engine.begin() as conn:
+        await conn.execute(text("CREATE INDEX ix_uploads_status ON uploads (status)"))
+        await conn.execute(text(
+            "CREATE INDEX ix_uploads_file_hash_sha256 ON uploads (file_hash_sha256)"
+        ))
+
+    await legacy_db.init_db()
+
+    async with legacy_db.engine.connect() as conn:
+        result = await conn.execute(text("PRAGMA index_list(uploads)"))
+        indexes = {row[1] for row in result.fetchall()}
+
+    assert not {"ix_uploads_status", "ix_uploads_file_hash_sha256"} & indexes
+
+
+def test_database_path_follows_env_after_cache_clear(tmp_path, monkeypatch):
+    """get_database_path is cached until cache_clear() is called."""
+    from app.database import get_database_path
+
+    monkeypatch.setenv("DATABASE_PATH", str(tmp_path / "first.db"))
+    get_database_path.cache_clear()
+    assert get_database_path().endswith("first.db")
+
+    monkeypatch.setenv("DATABASE_PATH", str(tmp_path / "second.db"))
+    assert get_database_path().endswith("first.db")
+
+    get_database_path.cache_clear()
+    assert get_database_path().endswith("second.db")
+    get_database_path.cache_clear()
+
+
+async def test_flag_columns_round_trip_as_bool(tmp_path):
+    """BoolInt columns are stored as integers and read back as bools."""
+    from app.database import Upload
+
+    database = Database(f"sqlite+aiosqlite:///{tmp_path / 'flags.db'}")
+    await database.init_db()
+    async with database.async_session_maker() as session:
+        session.add(Upload(
+            uuid="flag-test", original_filename="a.epub", sanitized_filename="a.epub",
+            file_size=1, file_extension=".epub", quarantine_path="/tmp/a.epub",
+            is_duplicate=True,
+        ))
+        await session.commit()
+
+    async with database.engine.connect() as conn:
+        stored = (await conn.execute(text(
+            "SELECT is_duplicate, metadata_edited, typeof(is_duplicate) FROM uploads"
+        ))).one()
+    assert tuple(stored) == (1, 0, "integer")
+
+    async with database.async_session_maker() as session:
+        upload = await session.get(Upload, 1)
+        assert upload.is_duplicate is True
+        assert upload.metadata_edited is False
+    await database.engine.dispose()
+
+
+async def test_init_db_skips_migration_when_schema_current(legacy_db, monkeypatch):
+    """Once the schema version is recorded, init_db does not migrate again."""
+    from app.database import SCHEMA_VERSION
+
+    await legacy_db.init_db()
+    async with legacy_db.engine.connect() as conn:
+        version = (await conn.execute(text("PRAGMA user_version"))).scalar()
+    assert version == SCHEMA_VERSION
+
+    async def fail(conn):
+        raise AssertionError("migration should have been skipped")
+
+    monkeypatch.setattr(legacy_db, "_migrate_schema", fail)
+    await legacy_db.init_db()
+
+
+async def test_metadata_lookup_keys_follow_metadata_json(legacy_db):
+    """title_lc/author_lc are backfilled on migration and kept in sync on assignment."""
+    import json
+    from app.database import Upload
+
+    async with legacy_db.engine.begin() as conn:
+        await conn.execute(text("ALTER TABLE uploads ADD COLUMN metadata_json TEXT"))
+        await conn.execute(text(
+            "INSERT INTO uploads (uuid, original_filename, sanitized_filename, file_size, "
+            "file_extension, status, quarantine_path, uploaded_at, metadata_json) VALUES "
+            "('old', 'a.epub', 'a.epub', 1, '.epub', 'moved', '/tmp/a.epub', "
+            "CURRENT_TIMESTAMP, '{\"title\": \" Émile \", \"author\": \"ZOLA\"}')"
+        ))
+    await legacy_db.init_db()
+
+    async with legacy_db.async_session_maker() as session:
+        upload = await session.get(Upload, 1)
+        assert (upload.title_lc, upload.author_lc) == ("émile", "zola")
+
+        upload.metadata_json = json.dumps({"title": "Nana", "author": 42})
+        assert (upload.title_lc, upload.author_lc) == ("nana", None)
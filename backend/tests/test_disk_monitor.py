@@ -0,0 +1,158 @@
+"""Tests for disk space monitoring and quarantine cleanup."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.database import Upload
+from app import disk_monitor
+from app.disk_monitor import DiskMonitor
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Cached sizes must not leak between tests using different databases."""
+    disk_monitor._cache.clear()
+    yield
+    disk_monitor._cache.clear()
+
+
+@pytest.fixture
+def quarantine(tmp_path):
+    path = tmp_path / "quarantine"
+    path.mkdir()
+    return path
+
+
+@pytest.fixture
+def add_quarantined(add_upload, quarantine):
+    """Create an Upload row (and its quarantine file unless write=False)."""
+    async def add(name, size, age_hours=100, status="quarantined", write=True):
+        path = quarantine / name
+        if write:
+            path.write_bytes(b"x" * size)
+        return await add_upload(
+            name, age_hours=age_hours, file_size=size, status=status, quarantine_path=str(path)
+        )
+    return add
+
+
+async def statuses(db_session):
+    result = await db_session.execute(select(Upload.uuid, Upload.status))
+    return dict(result.all())
+
+
+async def test_cleanup_old_files_deletes_only_expired(db_session, add_quarantined, quarantine):
+    """Files older than the cutoff are deleted and marked auto_deleted."""
+    await add_quarantined("old.epub", 100, age_hours=100)
+    await add_quarantined("new.epub", 50, age_hours=1)
+
+    freed = await DiskMonitor.cleanup_old_files(db_session, max_age_hours=72)
+
+    assert freed == 100
+    assert not (quarantine / "old.epub").exists()
+    assert (quarantine / "new.epub").exists()
+    assert await statuses(db_session) == {"old.epub": "auto_deleted", "new.epub": "quarantined"}
+
+
+async def test_cleanup_marks_missing_files_without_counting_them(db_session, add_quarantined):
+    """Rows whose file is already gone are still marked, but free no bytes."""
+    await add_quarantined("gone.epub", 100, write=False)
+
+    freed = await DiskMonitor.cleanup_old_files(db_session, max_age_hours=72)
+
+    assert freed == 0
+    assert await statuses(db_session) == {"gone.epub": "auto_deleted"}
+
+
+async def test_emergency_cleanup_stops_at_target(db_session, add_quarantined, quarantine):
+    """Emergency cleanup deletes oldest files first and stops once the target is met."""
+    await add_quarantined("a.epub", 100, age_hours=30)
+    await add_quarantined("b.epub", 100, age_hours=20)
+    await add_quarantined("c.epub", 100, age_hours=10)
+
+    freed = await DiskMonitor.emergency_cleanup(db_session, target_free_bytes=150)
+
+    assert freed == 200
+    assert await statuses(db_session) == {
+        "a.epub": "emergency_deleted",
+        "b.epub": "emergency_deleted",
+        "c.epub": "quarantined",
+    }
+    assert (quarantine / "c.epub").exists()
+
+
+async def test_cleanup_spans_multiple_partitions(db_session, add_quarantined, monkeypatch):
+    """Candidates streamed across several partitions are all cleaned up."""
+    monkeypatch.setattr("app.disk_monitor.CLEANUP_FETCH_SIZE", 2)
+    monkeypatch.setattr("app.disk_monitor.CLEANUP_BATCH_SIZE", 1)
+    for i in range(5):
+        await add_quarantined(f"{i}.epub", 10, age_hours=100 + i)
+
+    freed = await DiskMonitor.cleanup_old_files(db_session, max_age_hours=72)
+
+    assert freed == 50
+    assert set((await statuses(db_session)).values()) == {"auto_deleted"}
+
+
+async def test_quarantine_size_is_cached_until_invalidated(db_session, add_quarantined):
+    """get_quarantine_size reuses its result until invalidated."""
+    await add_quarantined("a.epub", 100)
+    assert await DiskMonitor.get_quarantine_size(db_session) == 100
+
+    await add_quarantined("b.epub", 50)
+    assert await DiskMonitor.get_quarantine_size(db_session) == 100
+
+    DiskMonitor.invalidate_quarantine_cache()
+    assert await DiskMonitor.get_quarantine_size(db_session) == 150
+
+
+async def test_disk_usage_is_cached_per_path(tmp_path, monkeypatch):
+    """Repeated disk usage lookups within the TTL skip statvfs."""
+    calls = []
+    real_disk_usage = disk_monitor.shutil.disk_usage
+
+    def counting_disk_usage(path):
+        calls.append(path)
+        return real_disk_usage(path)
+
+    monkeypatch.setattr(disk_monitor.shutil, "disk_usage", counting_disk_usage)
+
+    first = await DiskMonitor.get_disk_usage(tmp_path)
+    assert await DiskMonitor.get_disk_usage(tmp_path) == first
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("max_age_hours", [72, None])
+async def test_cleanup_queries_use_status_index(db_session, max_age_hours):
+    """Cleanup candidate queries search an index instead of scanning uploads."""
+    from sqlalchemy import text
+    from app.disk_monitor import _CLEANUP_COLUMNS
+
+    conditions = [Upload.status.in_(["quarantined", "scanning", "scan_failed"])]
+    if max_age_hours is not None:
+        conditions.append(Upload.uploaded_at < datetime.utcnow() - timedelta(hours=max_age_hours))
+    stmt = select(*_CLEANUP_COLUMNS).where(*conditions).order_by(Upload.uploaded_at.asc())
+    sql = str(stmt.compile(compile_kwargs={"literal_binds": True}))
+
+    plan = (await db_session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))).all()
+    details = " ".join(row[3] for row in plan)
+
+    assert "SEARCH uploads USING" in details
+    assert "SCAN uploads" not in details
+
+
+async def test_disk_status_counts_and_quarantine_size(db_session, add_quarantined, quarantine, monkeypatch):
+    """get_disk_status reports per-status counts and the quarantined bytes."""
+    from app.config import config
+
+    monkeypatch.setattr(config.folders, "quarantine", str(quarantine))
+    await add_quarantined("a.epub", 100)
+    await add_quarantined("b.epub", 50, status="scanning")
+    await add_quarantined("c.epub", 70, status="moved")
+
+    status = await DiskMonitor.get_disk_status(db_session)
+
+    assert status["quarantine"]["total_size"] == 150
+    assert status["quarantine"]["file_counts"] == {"quarantined": 1, "scanning": 1, "moved": 1}
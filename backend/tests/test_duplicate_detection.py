@@ -0,0 +1,144 @@
+"""Tests for hash-based duplicate detection."""
+
+from app.config import config
+from app.duplicate_detection import DuplicateDetector
+
+
+async def test_hash_match_reports_oldest_upload(db_session, add_upload):
+    """An exact hash match is a duplicate of the earliest upload with that hash."""
+    await add_upload("same-size", status="moved", file_hash_sha256="b" * 64, file_size=100, age_hours=30)
+    await add_upload("original", status="moved", file_hash_sha256="a" * 64, file_size=100, age_hours=20)
+    await add_upload("copy", status="moved", file_hash_sha256="a" * 64, file_size=100, age_hours=10)
+
+    result = await DuplicateDetector.check_duplicate("a" * 64, 100, db_session)
+
+    assert result["is_duplicate"] is True
+    assert result["method"] == "hash"
+    assert result["original_uuid"] == "original"
+
+
+async def test_size_only_match_is_not_duplicate(db_session, add_upload):
+    """Files that only share a size are not reported as duplicates."""
+    await add_upload("other", status="moved", file_hash_sha256="b" * 64, file_size=100)
+
+    result = await DuplicateDetector.check_duplicate("a" * 64, 100, db_session)
+
+    assert result == {"is_duplicate": False, "reason": "unique_file"}
+
+
+async def test_hash_check_disabled_ignores_hash_match(db_session, add_upload, monkeypatch):
+    """With check_by_hash off, a matching hash is not a duplicate."""
+    monkeypatch.setattr(config.duplicate_detection, "check_by_hash", False)
+    await add_upload("original", status="moved", file_hash_sha256="a" * 64, file_size=100)
+
+    result = await DuplicateDetector.check_duplicate("a" * 64, 100, db_session)
+
+    assert result["is_duplicate"] is False
+
+
+async def test_same_size_candidates_are_counted(db_session, add_upload, caplog):
+    """The size-only branch reports how many files share the size."""
+    for i in range(3):
+        await add_upload(f"other-{i}", status="moved", file_hash_sha256=f"{i}" * 64, file_size=100)
+
+    result = await DuplicateDetector.check_duplicate("a" * 64, 100, db_session)
+
+    assert result["is_duplicate"] is False
+    assert "Found 3 files with same size" in caplog.text
+
+
+async def test_library_duplicate_found_through_index(db_session, tmp_path):
+    """Files indexed by LibraryIndex.refresh are found by hash."""
+    import hashlib
+    from app.library_index import LibraryIndex
+
+    library = tmp_path / "library"
+    (library / "Author").mkdir(parents=True)
+    book = library / "Author" / "book.epub"
+    book.write_bytes(b"book contents")
+    book_hash = hashlib.sha256(b"book contents").hexdigest()
+
+    assert await LibraryIndex.refresh(db_session, [str(library)]) == 1
+    result = await DuplicateDetector.check_library_duplicates(book_hash, db_session, str(library))
+    assert result["in_library"] is True
+    assert result["duplicate_path"] == str(book)
+
+    # Unchanged files are not hashed again
+    assert await LibraryIndex.refresh(db_session, [str(library)]) == 0
+
+    book.unlink()
+    await LibraryIndex.refresh(db_session, [str(library)])
+    result = await DuplicateDetector.check_library_duplicates(book_hash, db_session, str(library))
+    assert result == {"in_library": False, "reason": "not_found", "duplicate_path": None}
+
+
+async def test_refresh_hashes_many_files_concurrently(db_session, tmp_path, monkeypatch):
+    """Each file gets its own hash when several are hashed at once."""
+    import hashlib
+    from app import library_index
+    from app.library_index import LibraryIndex
+
+    monkeypatch.setattr(library_index, "_HASH_CONCURRENCY", 3)
+    library = tmp_path / "library"
+    library.mkdir()
+    for i in range(10):
+        (library / f"{i}.epub").write_bytes(f"book {i}".encode())
+
+    assert await LibraryIndex.refresh(db_session, [str(library)]) == 10
+    for i in range(10):
+        book_hash = hashlib.sha256(f"book {i}".encode()).hexdigest()
+        assert await LibraryIndex.find(db_session, book_hash, [str(library)]) == str(library / f"{i}.epub")
+
+
+async def test_refresh_indexes_only_regular_files(db_session, tmp_path):
+    """Hidden files, FIFOs and symlinked directories are left out of the index."""
+    import os
+    from sqlalchemy import select
+    from app.database import LibraryFile
+    from app.library_index import LibraryIndex
+
+    library = tmp_path / "library"
+    (library / "Author" / "Series").mkdir(parents=True)
+    (library / "Author" / "Series" / "book.epub").write_bytes(b"nested")
+    (library / ".hidden.epub").write_bytes(b"hidden")
+    os.mkfifo(library / "pipe")
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    (elsewhere / "other.epub").write_bytes(b"outside")
+    (library / "linked").symlink_to(elsewhere, target_is_directory=True)
+    (library / "alias.epub").symlink_to(library / "Author" / "Series" / "book.epub")
+
+    assert await LibraryIndex.refresh(db_session, [str(library)]) == 2
+    paths = set((await db_session.execute(select(LibraryFile.path))).scalars())
+    assert paths == {str(library / "Author" / "Series" / "book.epub"), str(library / "alias.epub")}
+
+
+async def test_refresh_does_not_hold_write_lock_while_hashing(db_session, tmp_path, monkeypatch):
+    """Other writers are not locked out while library files are being hashed."""
+    import sqlite3
+    from app import library_index
+    from app.library_index import LibraryIndex
+
+    library = tmp_path / "library"
+    library.mkdir()
+    (library / "old.epub").write_bytes(b"old")
+    await LibraryIndex.refresh(db_session, [str(library)])
+    await db_session.commit()
+    (library / "old.epub").unlink()  # its row is deleted by the next refresh
+    (library / "new.epub").write_bytes(b"new")
+
+    real_hash_file = library_index._hash_file
+    database_path = db_session.bind.url.database
+
+    def hash_while_writing(path):
+        writer = sqlite3.connect(database_path, timeout=0.1)
+        try:
+            writer.execute("UPDATE library_files SET mtime = mtime")
+            writer.commit()
+        finally:
+            writer.close()
+        return real_hash_file(path)
+
+    monkeypatch.setattr(library_index, "_hash_file", hash_while_writing)
+
+    assert await LibraryIndex.refresh(db_session, [str(library)]) == 1
@@ -0,0 +1,79 @@
+"""Tests for per-upload file logging."""
+
+import pytest
+
+from app import file_logger
+from app.file_logger import FileLogger
+
+
+@pytest.fixture
+def log_cwd(tmp_path, monkeypatch):
+    """Run in a temp directory so logs/files is created there."""
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    file_logger._stop_listener()
+
+
+def read_log(logger: FileLogger) -> str:
+    """Flush the shared listener and return the upload's log contents."""
+    file_logger._stop_listener()
+    return logger.log_file.read_text()
+
+
+def test_events_are_written_to_upload_log(log_cwd):
+    """Phases, errors and the final status end up in the upload's own file."""
+    logger = FileLogger("0123456789abcdef", "book.epub")
+
+    logger.log_phase("scan", "started")
+    logger.log_error("Scan failed", ValueError("bad file"))
+    logger.finalize("scan_error")
+
+    contents = read_log(logger)
+    assert FileLogger.get_log_file_for_upload("0123456789abcdef") == logger.log_file
+    assert "[UPLOAD_STARTED]" in contents
+    assert "[SCAN_STARTED]" in contents
+    assert '"phase":"scan"' in contents  # one compact line per event
+    assert "ValueError" in contents
+    assert "FINAL STATUS: scan_error" in contents
+
+
+def test_uploads_log_to_separate_files(log_cwd):
+    """Concurrent uploads share the listener but not their log files."""
+    first = FileLogger("aaaaaaaa-1", "first.epub")
+    second = FileLogger("bbbbbbbb-2", "second.epub")
+
+    first.log_phase("upload", "completed")
+    second.log_phase("scan", "queued")
+    first.finalize("moved")
+    second.finalize("failed")
+
+    file_logger._stop_listener()
+    assert "first.epub" in first.log_file.read_text()
+    assert "second.epub" not in first.log_file.read_text()
+    assert "FINAL STATUS: failed" in second.log_file.read_text()
+
+
+def test_constructor_does_no_file_io(log_cwd, monkeypatch):
+    """Creating a FileLogger leaves directory and file creation to the listener."""
+    monkeypatch.setattr(file_logger, "_ensure_listener", lambda: None)
+
+    logger = FileLogger("cccccccc-3", "third.epub")
+
+    assert not (log_cwd / "logs").exists()
+    assert not logger.log_file.exists()
+
+
+def test_unwritable_log_does_not_stop_listener(log_cwd, monkeypatch):
+    """A failure opening one upload's log leaves other uploads' logging working."""
+    monkeypatch.setattr(file_logger.logging, "raiseExceptions", False)
+    (log_cwd / "logs").mkdir()
+    (log_cwd / "logs" / "files").write_text("not a directory")
+    broken = FileLogger("dddddddd-4", "broken.epub")
+    broken.log_phase("upload", "completed")
+    broken.finalize("failed")
+
+    (log_cwd / "logs" / "files").unlink()
+    working = FileLogger("eeeeeeee-5", "working.epub")
+    working.finalize("moved")
+
+    assert "FINAL STATUS: moved" in read_log(working)
@@ -0,0 +1,117 @@
+"""Tests for the Kavita API client."""
+
+import asyncio
+import os
+import time
+
+import httpx
+
+from app.kavita_api import KavitaAPIClient, _parse_libraries, close_http_client, get_http_client
+
+
+def counting_client(monkeypatch):
+    """Client whose _fetch_libraries counts calls instead of hitting Kavita."""
+    client = KavitaAPIClient()
+    calls = []
+
+    async def fake_fetch():
+        calls.append(1)
+        await asyncio.sleep(0)
+        client._libraries_cache = [{"path": f"/library/{len(calls)}"}]
+        client._cache_timestamp = time.monotonic()
+        return client._libraries_cache
+
+    monkeypatch.setattr(client, "_fetch_libraries", fake_fetch)
+    return client, calls
+
+
+def test_each_folder_becomes_an_entry():
+    """Folder objects and plain folder strings both yield library entries."""
+    data = [
+        {
+            "id": 1,
+            "name": "Comics",
+            "type": 1,
+            "folders": [{"path": "/library/comics"}, "/library/comics2"],
+        },
+        {"id": 2, "name": "Books", "libraryType": 2, "rootFolders": [{"folderPath": "/library/books"}]},
+    ]
+
+    assert _parse_libraries(data) == [
+        {"id": 1, "name": "Comics", "path": "/library/comics", "type": 1},
+        {"id": 1, "name": "Comics", "path": "/library/comics2", "type": 1},
+        {"id": 2, "name": "Books", "path": "/library/books", "type": 2},
+    ]
+
+
+def test_wrapped_response_and_direct_paths():
+    """Wrapped responses, libraries without folders and bare path strings are handled."""
+    data = {
+        "data": [
+            {"id": 3, "name": "Manga", "path": "/library/manga"},
+            {"id": 4, "name": "Empty", "folders": []},
+            "/library/loose",
+        ]
+    }
+
+    assert _parse_libraries(data) == [
+        {"id": 3, "name": "Manga", "path": "/library/manga", "type": "Unknown"},
+        {"id": None, "name": "/library/loose", "path": "/library/loose", "type": "Unknown"},
+    ]
+
+
+async def test_concurrent_cold_callers_share_one_fetch(monkeypatch):
+    """Callers racing on an empty cache wait for a single refresh."""
+    client, calls = counting_client(monkeypatch)
+
+    results = await asyncio.gather(*(client.get_libraries() for _ in range(5)))
+
+    assert len(calls) == 1
+    assert all(result == [{"path": "/library/1"}] for result in results)
+
+
+async def test_stale_cache_is_served_while_refreshing(monkeypatch):
+    """Past the soft TTL the old list is returned and refreshed in the background."""
+    client, calls = counting_client(monkeypatch)
+    await client.get_libraries()
+    client._cache_timestamp -= client._cache_ttl + 1
+
+    stale = await asyncio.gather(*(client.get_libraries() for _ in range(3)))
+    await client._refresh_task
+
+    assert stale == [[{"path": "/library/1"}]] * 3
+    assert len(calls) == 2
+    assert await client.get_libraries() == [{"path": "/library/2"}]
+
+
+async def test_library_paths_resolved_once_per_library_list(monkeypatch, tmp_path):
+    """Resolved paths are reused until the libraries cache is replaced."""
+    client = KavitaAPIClient()
+    client._libraries_cache = [{"path": str(tmp_path)}, {"path": "missing-relative-dir"}]
+    client._cache_timestamp = time.monotonic()
+    exists_calls = []
+    real_exists = os.path.exists
+    monkeypatch.setattr(os.path, "exists", lambda p: exists_calls.append(p) or real_exists(p))
+
+    assert await client.get_library_paths() == [str(tmp_path)]
+    assert await client.get_library_paths() == [str(tmp_path)]
+
+    # Only the relative path needed a stat, and only once
+    assert [p for p in exists_calls if "missing-relative-dir" in p or p == str(tmp_path)] == [
+        os.path.abspath("missing-relative-dir")
+    ]
+
+
+async def test_shared_http_client_keeps_no_cookies():
+    """Cookies set on one user's login are never replayed on later requests."""
+    client = get_http_client()
+    try:
+        response = httpx.Response(
+            200,
+            headers={"set-cookie": "session=abc; Path=/"},
+            request=httpx.Request("POST", "http://kavita.local/api/Account/login"),
+        )
+        client.cookies.extract_cookies(response)
+        assert len(client.cookies.jar) == 0
+    finally:
+        await close_http_client()
@@ -0,0 +1,67 @@
+"""Tests for logger configuration and formatting."""
+
+import json
+import logging
+
+from app.logger import JSONFormatter, TextFormatter, setup_logger, stop_logger
+
+
+def test_json_formatter_includes_known_extra_fields():
+    """Known structured fields are copied from extra; others are left out."""
+    record = logging.LogRecord("uploader", logging.INFO, __file__, 1, "Scanned", None, None)
+    record.created, record.msecs = 0.0, 0.0
+    record.upload_uuid = "abc"
+    record.scan_result = "clean"
+    record.libraries = ["not", "logged"]
+
+    data = json.loads(JSONFormatter().format(record))
+
+    assert data["message"] == "Scanned"
+    assert data["timestamp"] == "1970-01-01T00:00:00.000Z"  # from record.created
+    assert data["upload_uuid"] == "abc"
+    assert data["scan_result"] == "clean"
+    assert "libraries" not in data
+
+
+def test_logger_level_follows_most_verbose_handler(tmp_path):
+    """Messages below every handler's level are dropped before a record is built."""
+    logger = setup_logger(
+        "uploader.test_levels",
+        log_level="WARNING",
+        log_file=str(tmp_path / "test.log"),
+        console_level="INFO",
+    )
+
+    stop_logger("uploader.test_levels")
+
+    assert logger.isEnabledFor(logging.INFO)
+    assert not logger.isEnabledFor(logging.DEBUG)
+
+
+def test_queued_records_reach_the_log_file(tmp_path):
+    """Records go through the queue listener and keep their exception info."""
+    log_file = tmp_path / "queued.log"
+    logger = setup_logger("uploader.test_queue", log_file=str(log_file), console_level="CRITICAL")
+
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.error("Failed %s", "upload", exc_info=True, extra={"upload_uuid": "abc"})
+    stop_logger("uploader.test_queue")
+
+    data = json.loads(log_file.read_text())
+    assert data["message"] == "Failed upload"
+    assert data["upload_uuid"] == "abc"
+    assert "ValueError: boom" in data["exception"]
+
+
+def test_text_formatter_line():
+    """Console lines carry level, UTC timestamp, message and short context."""
+    record = logging.LogRecord("uploader", logging.WARNING, __file__, 1, "Slow scan", None, None)
+    record.created = 0.0
+    record.upload_uuid = "0123456789abcdef"
+    record.scan_phase = "poll"
+
+    line = TextFormatter().format(record)
+
+    assert line == "\033[33m[WARNING]\033[0m 1970-01-01 00:00:00 - Slow scan (UUID:01234567, Phase:poll)"
@@ -0,0 +1,23 @@
+"""Tests for the upload processing services."""
+
+import hashlib
+import io
+
+from app.config import config
+from app.services import UploadService
+
+
+async def test_save_to_quarantine_copies_and_hashes_stream(db_session, tmp_path, monkeypatch):
+    """The upload is copied from its file object in chunks and hashed on the way."""
+    monkeypatch.setattr(config.folders, "quarantine", str(tmp_path / "quarantine"))
+    monkeypatch.setattr("app.services.COPY_CHUNK_SIZE", 4)
+    content = b"chapter one, chapter two"
+    source = io.BytesIO(content)
+    source.seek(5)  # position left behind by size checks must not matter
+
+    upload = await UploadService.save_to_quarantine(source, "My Book.epub", db_session)
+
+    with open(upload.quarantine_path, "rb") as f:
+        assert f.read() == content
+    assert upload.file_size == len(content)
+    assert upload.file_hash_sha256 == hashlib.sha256(content).hexdigest()
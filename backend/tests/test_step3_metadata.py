@@ -18,15 +18,111 @@ class TestMetadataExtractor:
         # Create a dummy test or skip if no test files available
         pass  # Placeholder - requires test PDF file
     
-    def test_epub_metadata_extraction(self):
-        """Test extracting metadata from an EPUB file."""
-        # This test requires a sample EPUB file
-        pass  # Placeholder - requires test EPUB file
+    def test_epub_metadata_extraction(self, tmp_path):
+        """Test extracting metadata from an EPUB's package document."""
+        import zipfile
+        
+        epub_path = tmp_path / "book.epub"
+        with zipfile.ZipFile(epub_path, "w") as z:
+            z.writestr("mimetype", "application/epub+zip")
+            z.writestr("META-INF/container.xml", (
+                '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container" version="1.0">'
+                '<rootfiles><rootfile full-path="OEBPS/content.opf" '
+                'media-type="application/oebps-package+xml"/></rootfiles></container>'
+            ))
+            z.writestr("OEBPS/content.opf", (
+                '<package xmlns="http://www.idpf.org/2007/opf" version="3.0">'
+                '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+                '<dc:title>Dune</dc:title><dc:creator>Frank Herbert</dc:creator>'
+                '<dc:creator>Second Author</dc:creator><dc:language>en</dc:language>'
+                '<dc:date>1965-08-01</dc:date></metadata>'
+                '<manifest>'
+                '<item id="c1" href="c1.xhtml" media-type="application/xhtml+xml"/>'
+                '<item id="c2" href="c2.xhtml" media-type="application/xhtml+xml"/>'
+                '<item id="css" href="style.css" media-type="text/css"/>'
+                '</manifest></package>'
+            ))
+        
+        metadata = MetadataExtractor.extract(epub_path, "epub")
+        
+        assert metadata["title"] == "Dune"
+        assert metadata["author"] == "Frank Herbert"
+        assert metadata["language"] == "en"
+        assert metadata["year"] == "1965"
+        assert metadata["pages"] == 2
+        assert metadata["extraction_method"] == "OPF"
+    
+    def test_comic_metadata_extraction(self, tmp_path):
+        """Test extracting metadata from a CBZ file with ComicInfo.xml."""
+        import zipfile
+        
+        cbz_path = tmp_path / "issue.cbz"
+        with zipfile.ZipFile(cbz_path, "w") as z:
+            z.writestr("ComicInfo.xml", (
+                "<ComicInfo><Title>Issue One</Title><Series>Saga</Series>"
+                "<Writer>Brian K. Vaughan</Writer><Year>2012</Year></ComicInfo>"
+            ))
+            for page in ("001.jpg", "002.PNG", "003.webp"):
+                z.writestr(page, b"image")
+            z.writestr("notes.txt", "not a page")
+        
+        metadata = MetadataExtractor.extract(cbz_path, "cbz")
+        
+        assert metadata["title"] == "Issue One"
+        assert metadata["series"] == "Saga"
+        assert metadata["author"] == "Brian K. Vaughan"
+        assert metadata["year"] == "2012"
+        assert metadata["pages"] == 3
+        assert metadata["extraction_method"] == "ComicInfo.xml"
+    
+    def test_comic_info_reads_only_top_level_fields(self):
+        """Nested elements are ignored and parsing stops once all fields are found."""
+        import io
+        
+        xml = (
+            b"<ComicInfo><Pages><Page><Title>Cover</Title></Page></Pages>"
+            b"<Title>Issue Two</Title><Series>Saga</Series><Volume>1</Volume>"
+            b"<Writer>BKV</Writer><Publisher>Image</Publisher><Year>2012</Year>"
+            b"<PageCount>22</PageCount><Summary>"
+        )  # truncated after the last field we need
+        
+        fields = MetadataExtractor._read_comic_info(io.BytesIO(xml))
+        
+        assert fields["Title"] == "Issue Two"
+        assert fields["PageCount"] == "22"
+        assert MetadataExtractor._read_comic_info(io.BytesIO(b"<ComicInfo><Title>")) is None
+    
+    async def test_extract_async_matches_extract(self, tmp_path):
+        """extract_async returns the same metadata as extract."""
+        import zipfile
+        
+        cbz_path = tmp_path / "async.cbz"
+        with zipfile.ZipFile(cbz_path, "w") as z:
+            z.writestr("001.jpg", b"image")
+        
+        metadata = await MetadataExtractor.extract_async(cbz_path, "cbz")
+        
+        assert metadata == MetadataExtractor.extract(cbz_path, "cbz")
+    
+    def test_comic_without_comicinfo(self, tmp_path):
+        """A CBZ without ComicInfo.xml falls back to the file name and page count."""
+        import zipfile
+        
+        cbz_path = tmp_path / "untitled.cbz"
+        with zipfile.ZipFile(cbz_path, "w") as z:
+            z.writestr("pages/001.jpeg", b"image")
+            z.writestr("pages/002.jpg", b"image")
+        
+        metadata = MetadataExtractor.extract(cbz_path, "cbz")
+        
+        assert metadata["title"] == "untitled"
+        assert metadata["pages"] == 2
+        assert metadata["extraction_method"] == "archive"
     
-    def test_comic_metadata_extraction(self):
-        """Test extracting metadata from CBZ/CBR files."""
-        # This test requires a sample comic archive
-        pass  # Placeholder - requires test CBZ/CBR file
+    def test_unsupported_extension_skips_file_access(self, tmp_path):
+        """Unsupported extensions are rejected without touching the file."""
+        metadata = MetadataExtractor.extract(tmp_path / "missing.txt", "txt")
+        assert metadata["extraction_method"] == "none"
     
     def test_validate_metadata_valid(self):
         """Test metadata validation with valid data."""
@@ -107,7 +107,7 @@ async def test_move_unique_file(upload_record, temp_dirs, db_session):
     # Verify file was moved
     dest_path = Path(result["destination"])
     assert dest_path.exists()
-    assert dest_path.parent == temp_dirs["unsorted"]
+    assert dest_path.parent == temp_dirs["unsorted"] / "processed"
     
     # Verify database was updated
     await db_session.refresh(upload_record)
@@ -116,6 +116,51 @@ async def test_move_unique_file(upload_record, temp_dirs, db_session):
     assert upload_record.moved_at is not None
 
 
+@pytest.mark.asyncio
+async def test_move_does_not_overwrite_existing_name(upload_record, temp_dirs, db_session):
+    """Test that a taken destination name gets a numbered suffix."""
+    processed = temp_dirs["unsorted"] / "processed"
+    processed.mkdir()
+    (processed / "test_book.pdf").write_bytes(b"someone else's book")
+    
+    result = await MoverService.move_file(upload_record.uuid, db_session)
+    
+    assert result["success"] is True
+    assert Path(result["destination"]) == processed / "test_book_1.pdf"
+    assert (processed / "test_book_1.pdf").read_bytes() == b"This is a test PDF file for duplicate detection."
+    assert (processed / "test_book.pdf").read_bytes() == b"someone else's book"
+
+
+def test_reserve_destination_claims_distinct_names(temp_dirs):
+    """Test that each reservation of the same name gets its own placeholder."""
+    from app.mover_service import _reserve_destination
+    
+    dest_dir = temp_dirs["unsorted"]
+    paths = [_reserve_destination(dest_dir, "book.epub") for _ in range(3)]
+    
+    assert [path.name for path in paths] == ["book.epub", "book_1.epub", "book_2.epub"]
+    assert all(path.exists() for path in paths)
+
+
+@pytest.mark.asyncio
+async def test_failed_move_removes_placeholder(upload_record, test_file, temp_dirs, db_session, monkeypatch):
+    """Test that a failed copy leaves neither a placeholder nor a partial file."""
+    from app import mover_service
+    
+    def failing_copy(source, destination):
+        destination.write_bytes(b"partial")
+        raise OSError("disk full")
+    
+    monkeypatch.setattr(mover_service, "_copy_and_hash", failing_copy)
+    monkeypatch.setattr(config.moving, "verify_integrity_post_move", True)
+    
+    result = await MoverService.move_file(upload_record.uuid, db_session)
+    
+    assert result["status"] == "move_failed"
+    assert not any((temp_dirs["unsorted"] / "processed").iterdir())
+    assert test_file.exists()
+
+
 @pytest.mark.asyncio
 async def test_duplicate_hash_in_database(upload_record, test_file, temp_dirs, db_session):
     """Test duplicate detection when hash exists in database."""
@@ -172,6 +217,98 @@ async def test_duplicate_hash_in_filesystem(upload_record, test_file, temp_dirs,
     assert upload_record.is_duplicate is True
 
 
+@pytest.mark.asyncio
+async def test_filesystem_check_hashes_library_files_once(test_file, temp_dirs, db_session, monkeypatch):
+    """Test that repeated filesystem checks reuse the library hash index."""
+    from app import library_index
+    
+    shutil.copy2(test_file, temp_dirs["library"] / "existing_book.pdf")
+    hashed = []
+    real_hash_file = library_index._hash_file
+    
+    def counting_hash_file(path):
+        hashed.append(path)
+        return real_hash_file(path)
+    
+    monkeypatch.setattr(library_index, "_hash_file", counting_hash_file)
+    search_dirs = [str(temp_dirs["library"])]
+    
+    for _ in range(2):
+        is_duplicate, _ = await MoverService.check_duplicates_in_filesystem(
+            "0" * 64, test_file.stat().st_size, search_dirs, db_session
+        )
+        assert is_duplicate is False
+    
+    assert len(hashed) == 1
+    
+    # Files of another size can never match and are not hashed
+    (temp_dirs["library"] / "other_book.pdf").write_bytes(b"different size")
+    await MoverService.check_duplicates_in_filesystem(
+        "0" * 64, test_file.stat().st_size, search_dirs, db_session
+    )
+    assert len(hashed) == 1
+
+
+@pytest.mark.asyncio
+async def test_filesystem_check_does_not_commit_caller_session(upload_record, temp_dirs, db_session):
+    """Test that refreshing the index leaves the caller's transaction alone."""
+    (temp_dirs["library"] / "same_size.pdf").write_bytes(b"x" * upload_record.file_size)
+    upload_record.error_message = "pending change"
+    
+    await MoverService.check_duplicates_in_filesystem(
+        "0" * 64, upload_record.file_size, [str(temp_dirs["library"])], db_session
+    )
+    await db_session.rollback()
+    await db_session.refresh(upload_record)
+    
+    assert upload_record.error_message is None
+    
+    # The index refresh itself was committed
+    from app.library_index import LibraryIndex
+    import hashlib
+    same_size_hash = hashlib.sha256(b"x" * upload_record.file_size).hexdigest()
+    assert await LibraryIndex.find(db_session, same_size_hash, [str(temp_dirs["library"])]) is not None
+
+
+@pytest.mark.asyncio
+async def test_filesystem_check_reuses_recent_library_scan(test_file, temp_dirs, db_session, monkeypatch):
+    """Test that back-to-back checks walk the libraries once."""
+    from app import library_index
+    
+    scans = []
+    real_scan_dirs = library_index._scan_dirs
+    
+    def counting_scan_dirs(search_dirs):
+        scans.append(search_dirs)
+        return real_scan_dirs(search_dirs)
+    
+    monkeypatch.setattr(library_index, "_scan_dirs", counting_scan_dirs)
+    search_dirs = [str(temp_dirs["library"])]
+    
+    for file_size in (10, 20):
+        await MoverService.check_duplicates_in_filesystem("0" * 64, file_size, search_dirs, db_session)
+    
+    assert len(scans) == 1
+
+
+@pytest.mark.asyncio
+async def test_filesystem_check_survives_locked_database(temp_dirs, db_session, monkeypatch):
+    """Test that a locked database during the refresh counts as no duplicate."""
+    from sqlalchemy.exc import OperationalError
+    from app.library_index import LibraryIndex
+    
+    async def locked_refresh(*args, **kwargs):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+    
+    monkeypatch.setattr(LibraryIndex, "refresh", locked_refresh)
+    
+    result = await MoverService.check_duplicates_in_filesystem(
+        "0" * 64, 10, [str(temp_dirs["library"])], db_session
+    )
+    
+    assert result == (False, None)
+
+
 @pytest.mark.asyncio
 async def test_name_conflict_with_rename(upload_record, temp_dirs, db_session):
     """Test name conflict with automatic renaming."""
@@ -286,6 +423,65 @@ async def test_integrity_verification(upload_record, test_file, temp_dirs, db_se
         config.moving.verify_integrity_post_move = original_verify
 
 
+@pytest.mark.asyncio
+async def test_integrity_failure_rolls_back(upload_record, test_file, temp_dirs, db_session):
+    """Test that a copy not matching the recorded hash is removed."""
+    upload_record.file_hash_sha256 = "0" * 64
+    await db_session.commit()
+    
+    original_verify = config.moving.verify_integrity_post_move
+    config.moving.verify_integrity_post_move = True
+    
+    try:
+        result = await MoverService.move_file(upload_record.uuid, db_session)
+        
+        assert result["success"] is False
+        assert result["status"] == "integrity_failed"
+        assert result["actual_hash"] == await MoverService.compute_file_hash(test_file)
+        
+        # Copy removed, quarantine file kept
+        assert not any((temp_dirs["unsorted"] / "processed").iterdir())
+        assert test_file.exists()
+    finally:
+        config.moving.verify_integrity_post_move = original_verify
+
+
+@pytest.mark.asyncio
+async def test_verified_move_hashes_during_copy(upload_record, temp_dirs, db_session, monkeypatch):
+    """Test that the verified copy path does not read the destination back."""
+    from app import mover_service
+    
+    def no_rehash(path):
+        raise AssertionError(f"destination re-hashed: {path}")
+    
+    monkeypatch.setattr(mover_service, "_hash_file", no_rehash)
+    monkeypatch.setattr(config.moving, "verify_integrity_post_move", True)
+    
+    result = await MoverService.move_file(upload_record.uuid, db_session)
+    
+    assert result["status"] == "moved"
+    assert Path(result["destination"]).read_bytes() == b"This is a test PDF file for duplicate detection."
+
+
+def test_copy_file_falls_back_without_copy_file_range(test_file, temp_dirs, monkeypatch):
+    """Test that the plain copy path is used when the kernel copy fails."""
+    import errno
+    import os
+    from app import mover_service
+    
+    def unsupported(*args):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+    
+    monkeypatch.setattr(os, "copy_file_range", unsupported, raising=False)
+    monkeypatch.setattr(mover_service, "HAS_COPY_FILE_RANGE", True)
+    destination = temp_dirs["unsorted"] / "copy.pdf"
+    
+    mover_service._copy_file(test_file, destination)
+    
+    assert destination.read_bytes() == test_file.read_bytes()
+    assert destination.stat().st_mtime == test_file.stat().st_mtime
+
+
 @pytest.mark.asyncio
 async def test_dry_run_mode(upload_record, test_file, temp_dirs, db_session):
     """Test dry run mode (no actual move)."""
@@ -347,6 +543,38 @@ async def test_checksum_manifest(upload_record, temp_dirs, db_session):
         config.moving.checksum_manifest = original_manifest
 
 
+@pytest.mark.asyncio
+async def test_manifest_header_written_once(temp_dirs):
+    """Test that manifest rows share one header across writes and reopens."""
+    from types import SimpleNamespace
+    from app.mover_service import close_manifest
+    
+    original_manifest = config.moving.checksum_manifest
+    config.moving.checksum_manifest = True
+    upload = SimpleNamespace(
+        uuid="manifest-uuid", original_filename="book.epub",
+        file_hash_sha256="ab" * 32, file_size=10
+    )
+    
+    try:
+        await MoverService.write_to_manifest(upload, "/library/book.epub", "moved")
+        await MoverService.write_to_manifest(upload, None, "discarded", "exact_hash_match_database")
+        close_manifest()
+        await MoverService.write_to_manifest(upload, "/library/book.epub", "renamed")
+        close_manifest()
+        
+        with open(config.moving.manifest_path, 'r') as f:
+            lines = f.read().splitlines()
+            f.seek(0)
+            rows = list(csv.DictReader(f))
+        
+        assert len(lines) == 4
+        assert [row["action"] for row in rows] == ["moved", "discarded", "renamed"]
+        assert rows[1]["destination_path"] == "N/A"
+    finally:
+        config.moving.checksum_manifest = original_manifest
+
+
 @pytest.mark.asyncio
 async def test_move_invalid_status(upload_record, db_session):
     """Test that move fails if file is not in correct status."""